@@ -0,0 +1,67 @@
+"""
+Date-string parsing shared by extraction and the analysis agents.
+
+Statement dates are stored verbatim (formats vary by bank), so the day of
+month and month abbreviation are recovered with a few cheap patterns.
+Extraction stores the result on each ``RawTransaction``; the agents fall
+back to these helpers for rows written before those columns existed.
+"""
+from __future__ import annotations
+
+import functools
+import re
+from typing import Optional
+
+
+# ─── Month ordering for Singapore bank statements ─────────────────────────────
+
+MONTH_MAP = {
+    "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
+    "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12,
+}
+
+# Date patterns, compiled once at import
+_RE_DMY = re.compile(r'(\d{1,2})[\-/]([A-Za-z]{3})')      # 01-Sep-2025 → day, month
+_RE_DDMM = re.compile(r'(\d{1,2})/\d{1,2}')               # 01/12/2025
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_day(date_str: str) -> Optional[int]:
+    """Extract day number from date string like '01 DEC', '15 JAN', '01-Sep-2025', '01/12/2025'.
+
+    Cached: a statement only has a few dozen distinct date strings.
+    """
+    if not date_str:
+        return None
+    date_str = date_str.strip()
+    # Try DD-MMM-YYYY (DBS format: 01-Sep-2025)
+    m = _RE_DMY.match(date_str)
+    if m:
+        return int(m.group(1))
+    # Try DD MMM (OCBC/UOB format: 01 DEC)
+    parts = date_str.split()
+    if parts and parts[0].isdigit():
+        return int(parts[0])
+    # Try DD/MM/YYYY
+    m = _RE_DDMM.match(date_str)
+    if m:
+        return int(m.group(1))
+    return None
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_month(date_str: str) -> Optional[str]:
+    """Extract month abbreviation from date string (cached like ``parse_day``)."""
+    if not date_str:
+        return None
+    date_str = date_str.strip().upper()
+    # Try DD-MMM-YYYY (e.g. 01-SEP-2025)
+    m = _RE_DMY.match(date_str)
+    if m and m.group(2) in MONTH_MAP:
+        return m.group(2)
+    # Try DD MMM (e.g. 01 DEC)
+    parts = date_str.split()
+    for p in parts:
+        if p in MONTH_MAP:
+            return p
+    return None
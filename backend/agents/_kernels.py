@@ -0,0 +1,72 @@
+"""
+Numeric kernels shared by the analysis agents.
+
+The hot scans over transaction amounts are written as simple loops and
+compiled with Numba when it is installed.  Numba is optional — without it
+each kernel falls back to an equivalent vectorised NumPy implementation,
+so callers never need to know which one they got.
+"""
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover — Numba is an optional speed-up
+    njit = None
+
+HAS_NUMBA = njit is not None
+
+
+# ─── Large-amount scan ────────────────────────────────────────────────────────
+
+def _large_indices_np(
+    amounts: np.ndarray, mask: np.ndarray, factor: float, min_count: int
+) -> Tuple[float, np.ndarray]:
+    idx = np.flatnonzero(mask)
+    if not idx.size:
+        return 0.0, idx
+    values = amounts[idx]
+    mean = float(values.mean())
+    if idx.size < min_count:
+        return mean, idx[:0]
+    return mean, idx[values >= mean * factor]
+
+
+def _large_indices_loop(amounts, mask, factor, min_count):
+    total = 0.0
+    n = 0
+    for i in range(amounts.size):
+        if mask[i]:
+            total += amounts[i]
+            n += 1
+    out = np.empty(n, dtype=np.int64)
+    if n == 0:
+        return 0.0, out
+    mean = total / n
+    if n < min_count:
+        return mean, out[:0]
+    threshold = mean * factor
+    k = 0
+    for i in range(amounts.size):
+        if mask[i] and amounts[i] >= threshold:
+            out[k] = i
+            k += 1
+    return mean, out[:k]
+
+
+_large_indices = njit(cache=True)(_large_indices_loop) if HAS_NUMBA else _large_indices_np
+
+
+def large_indices(
+    amounts: np.ndarray, mask: np.ndarray, factor: float, min_count: int = 1
+) -> Tuple[float, np.ndarray]:
+    """Return ``(mean, idx)`` for the rows selected by ``mask``: their mean
+    amount and the indices (in row order) whose amount is ≥ ``factor`` × mean.
+
+    When fewer than ``min_count`` rows are selected the threshold scan is
+    skipped and ``idx`` is empty — too few samples to call anything an outlier."""
+    mean, idx = _large_indices(amounts, mask, factor, min_count)
+    return float(mean), idx
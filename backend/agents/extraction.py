@@ -22,6 +22,7 @@ from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
+from agents._dates import parse_day, parse_month
 from agents.base import BaseAgent
 from models import Document, RawTransaction, StatementMetrics, AggregatedMetrics
 from services.pdf_processor import extract_text_with_pdfplumber, pdf_page_to_image, image_to_base64, is_scanned_pdf, ocr_all_pages
@@ -2364,10 +2365,13 @@ class ExtractionAgent(BaseAgent):
                 continue
             description = txn.get("description", "")
             channel = txn.get("channel", "")
+            date = txn.get("value_date") or txn.get("transaction_date")
             raw_txn = RawTransaction(
                 document_id=doc.id,
                 upload_group_id=doc.upload_group_id,
-                date=txn.get("value_date") or txn.get("transaction_date"),
+                date=date,
+                day=parse_day(date),
+                month=parse_month(date),
                 description=description,
                 transaction_type=txn_type,
                 amount=txn.get("withdrawal") or txn.get("deposit"),
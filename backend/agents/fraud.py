@@ -8,7 +8,7 @@ Checks:
   1. Round-Amount Transactions    — large round-number amounts (structuring)
   2. Duplicate / Near-Duplicate   — same amount + date + counterparty
   3. Rapid Succession             — many transactions in same day
-  4. Large Outlier Transactions   — amounts > 3 std-dev above mean
+  4. Large Outlier Transactions   — amounts > median + 3.5 MAD (robust z-score)
   5. Balance Anomalies            — sudden large swings in running balance
   6. Cash-Heavy Activity          — disproportionate cash deposits / withdrawals
   7. Unusual Timing Patterns      — concentration at start/end of month
@@ -17,16 +17,24 @@ Checks:
 
 from __future__ import annotations
 
+import functools
 import json
 import logging
 import math
 import re
-import statistics
 from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import takewhile
 from typing import List, Optional
 
+import numpy as np
 from sqlalchemy.orm import Session
 
+try:  # optional — only used to speed up grouping on very large statements
+    import pandas as pd
+except ImportError:  # pragma: no cover
+    pd = None
+
 from agents.base import BaseAgent
 from models import Document, RawTransaction, StatementMetrics
 from services.llm_client import chat_completion
@@ -39,21 +47,43 @@ ROUND_AMOUNT_THRESHOLD = 5_000       # flag round amounts ≥ this
 ROUND_MODULO = 1_000                 # "round" = divisible by this
 DUPLICATE_WINDOW_DAYS = 1            # same day = potential duplicate
 RAPID_TXN_THRESHOLD = 10            # ≥ N txns in one day = flag
-OUTLIER_STD_DEVS = 3.0              # amounts > mean + 3σ
+OUTLIER_STD_DEVS = 3.0              # amounts > mean + 3σ (small-sample fallback)
+OUTLIER_MAD_Z = 3.5                 # amounts > median + 3.5 · MAD-z
+OUTLIER_MAD_MIN_SAMPLES = 20        # below this, use mean + 3σ
+MAD_TO_SIGMA = 1.4826               # MAD → σ scale factor for normal data
 BALANCE_SWING_RATIO = 0.5           # balance changes > 50% of max balance
 CASH_RATIO_THRESHOLD = 0.30          # cash > 30% of total = flag
 MONTH_EDGE_DAYS = {1, 2, 3, 28, 29, 30, 31}  # start / end of month
+COUNTERPARTY_MIN_UNIQUE = 5          # fewer distinct counterparties = skip LLM
+PANDAS_MIN_ROWS = 5_000              # use pandas groupby at/above this many txns
 
 
 # ─── Helpers ──────────────────────────────────────────────────────────────────
 
+# Only the columns the checks read — fetched as plain rows rather than
+# hydrated ORM objects.
+_TXN_COLUMNS = (
+    RawTransaction.date,
+    RawTransaction.amount,
+    RawTransaction.transaction_type,
+    RawTransaction.counterparty,
+    RawTransaction.description,
+    RawTransaction.balance,
+    RawTransaction.is_cash,
+)
+
+_RE_DAY_SEP = re.compile(r"(\d{1,2})[\-/]")    # 01-Sep-2025, 01/12
+_RE_WS = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
 def _parse_day(date_str: str) -> Optional[int]:
-    """Extract day-of-month from various date formats."""
+    """Extract day-of-month from various date formats (cached per string)."""
     if not date_str:
         return None
     date_str = date_str.strip()
     # DD-MMM-YYYY or DD/MMM
-    m = re.match(r"(\d{1,2})[\-/]", date_str)
+    m = _RE_DAY_SEP.match(date_str)
     if m:
         return int(m.group(1))
     # DD MMM
@@ -63,16 +93,96 @@ def _parse_day(date_str: str) -> Optional[int]:
     return None
 
 
+@functools.lru_cache(maxsize=4096)
 def _date_key(date_str: str) -> str:
     """Normalise a date string to a sortable key for grouping by day."""
     if not date_str:
         return ""
-    return re.sub(r"\s+", " ", date_str.strip().upper())
+    return _RE_WS.sub(" ", date_str.strip().upper())
+
+
+def _parse_json_object(raw: str) -> dict:
+    """Parse the outermost ``{...}`` in an LLM reply, ignoring any markdown
+    fences or prose around it."""
+    start = raw.find("{")
+    end = raw.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError(f"no JSON object in LLM response: {raw[:100]!r}")
+    return json.loads(raw[start:end + 1], strict=False)
+
+
+@dataclass(slots=True)
+class TxnView:
+    """Denormalised, read-only view of a transaction shared by all checks.
+
+    The sliced / upper-cased fields are computed once per transaction so the
+    individual checks can index them directly instead of re-deriving them.
+    """
+    date: Optional[str]
+    date_norm: str                  # _date_key(date)
+    amount: Optional[float]         # raw amount (None when missing)
+    type: Optional[str]             # credit / debit
+    counterparty: str               # raw counterparty or ""
+    cp30: str                       # counterparty[:30] upper — duplicate key
+    cp60: str                       # (counterparty or description)[:60] upper
+    desc80: str                     # description[:80]
+    balance: Optional[float]
+    is_cash: bool
+
+
+@dataclass(slots=True)
+class DayAggregates:
+    """Per-day aggregates gathered while building the views, shared by the
+    rapid-succession and timing checks so neither re-iterates transactions."""
+    by_day: Counter = field(default_factory=Counter)             # date_norm → count
+    day_amounts: dict = field(default_factory=lambda: defaultdict(float))
+    edge_count: int = 0                                          # month start/end
+    mid_count: int = 0
+
+
+def _build_views(txns) -> tuple[List[TxnView], DayAggregates]:
+    """Convert ``_TXN_COLUMNS`` rows into TxnViews and fill the per-day
+    aggregates in the same pass."""
+    views = []
+    agg = DayAggregates()
+    by_day = agg.by_day
+    day_amounts = agg.day_amounts
+    edge_count = mid_count = 0
+    for t in txns:
+        date = t.date
+        cp = t.counterparty or ""
+        desc = t.description or ""
+        dk = _date_key(date)
+        day = _parse_day(date)
+        amount = t.amount
+        views.append(TxnView(
+            date=date,
+            date_norm=dk,
+            amount=amount,
+            type=t.transaction_type,
+            counterparty=cp,
+            cp30=cp.upper()[:30],
+            cp60=(cp or desc).strip()[:60].upper(),
+            desc80=desc[:80],
+            balance=t.balance,
+            is_cash=bool(t.is_cash),
+        ))
+        if dk:
+            by_day[dk] += 1
+            day_amounts[dk] += amount or 0
+        if day is not None:
+            if day in MONTH_EDGE_DAYS:
+                edge_count += 1
+            else:
+                mid_count += 1
+    agg.edge_count = edge_count
+    agg.mid_count = mid_count
+    return views, agg
 
 
 # ─── Individual Fraud Checks ─────────────────────────────────────────────────
 
-def check_round_amounts(txns: List[RawTransaction]) -> dict:
+def check_round_amounts(txns: List[TxnView]) -> dict:
     """Check 1: Flag large round-number transactions (structuring signal)."""
     name = "Round-Amount Transactions"
     flagged = []
@@ -82,9 +192,9 @@ def check_round_amounts(txns: List[RawTransaction]) -> dict:
             flagged.append({
                 "date": t.date,
                 "amount": amt,
-                "type": t.transaction_type,
-                "description": (t.description or "")[:80],
-                "explanation": f"This {t.transaction_type or 'transaction'} of {amt:,.2f} is a round number "
+                "type": t.type,
+                "description": t.desc80,
+                "explanation": f"This {t.type or 'transaction'} of {amt:,.2f} is a round number "
                                f"(÷ {ROUND_MODULO:,} = {int(amt // ROUND_MODULO)}). Large round-amount "
                                f"transactions can indicate structuring — deliberately splitting or "
                                f"rounding payments to avoid reporting thresholds.",
@@ -101,13 +211,13 @@ def check_round_amounts(txns: List[RawTransaction]) -> dict:
             "flagged_items": flagged[:20]}
 
 
-def check_duplicates(txns: List[RawTransaction]) -> dict:
+def check_duplicates(txns: List[TxnView]) -> dict:
     """Check 2: Flag potential duplicate transactions (same date+amount+counterparty)."""
     name = "Duplicate / Near-Duplicate Transactions"
     seen: dict[str, list] = defaultdict(list)
 
     for t in txns:
-        key = f"{_date_key(t.date)}|{t.amount or 0:.2f}|{(t.counterparty or '').upper()[:30]}"
+        key = f"{t.date_norm}|{t.amount or 0:.2f}|{t.cp30}"
         seen[key].append(t)
 
     dupes = []
@@ -119,8 +229,8 @@ def check_duplicates(txns: List[RawTransaction]) -> dict:
                 "count": len(group),
                 "date": t0.date,
                 "amount": t0.amount,
-                "counterparty": t0.counterparty or "",
-                "description": (t0.description or "")[:80],
+                "counterparty": t0.counterparty,
+                "description": t0.desc80,
                 "explanation": f"{len(group)} identical transactions of {(t0.amount or 0):,.2f} to/from "
                                f"'{cp}' on {t0.date}. Duplicate transactions with the same amount, "
                                f"date and counterparty may indicate processing errors, double-billing, "
@@ -139,19 +249,14 @@ def check_duplicates(txns: List[RawTransaction]) -> dict:
             "flagged_items": dupes[:20]}
 
 
-def check_rapid_succession(txns: List[RawTransaction]) -> dict:
+def check_rapid_succession(agg: DayAggregates) -> dict:
     """Check 3: Flag days with unusually high transaction counts."""
     name = "Rapid Succession Transactions"
-    by_day: dict[str, int] = Counter()
-    day_amounts: dict[str, float] = defaultdict(float)
-    for t in txns:
-        dk = _date_key(t.date)
-        if dk:
-            by_day[dk] += 1
-            day_amounts[dk] += t.amount or 0
+    day_amounts = agg.day_amounts
 
-    busy_days = [(day, cnt) for day, cnt in by_day.items() if cnt >= RAPID_TXN_THRESHOLD]
-    busy_days.sort(key=lambda x: x[1], reverse=True)
+    # most_common() is already sorted by count, so stop at the first quiet day
+    busy_days = list(takewhile(lambda x: x[1] >= RAPID_TXN_THRESHOLD,
+                               agg.by_day.most_common()))
 
     if not busy_days:
         return {"check": name, "status": "pass",
@@ -172,33 +277,50 @@ def check_rapid_succession(txns: List[RawTransaction]) -> dict:
             "flagged_items": items}
 
 
-def check_large_outliers(txns: List[RawTransaction]) -> dict:
-    """Check 4: Flag amounts > mean + 3σ (statistical outliers)."""
+def check_large_outliers(txns: List[TxnView]) -> dict:
+    """Check 4: Flag statistical outliers.
+
+    Uses the robust median + 3.5·MAD rule (a single huge amount cannot inflate
+    the spread and mask itself).  Falls back to mean + 3σ for small samples or
+    when the MAD is zero (e.g. mostly identical amounts).
+    """
     name = "Large Outlier Transactions"
-    amounts = [t.amount for t in txns if t.amount and t.amount > 0]
+    amounts = np.fromiter((t.amount for t in txns if t.amount and t.amount > 0), dtype=np.float64)
 
-    if len(amounts) < 5:
+    if amounts.size < 5:
         return {"check": name, "status": "pass",
                 "details": "Too few transactions for outlier analysis.",
                 "flagged_items": []}
 
-    mean = statistics.mean(amounts)
-    stdev = statistics.stdev(amounts)
-    threshold = mean + OUTLIER_STD_DEVS * stdev
+    mad = 0.0
+    if amounts.size >= OUTLIER_MAD_MIN_SAMPLES:
+        median = float(np.median(amounts))
+        mad = float(np.median(np.abs(amounts - median))) * MAD_TO_SIGMA
+
+    # ``unit`` follows the number directly: "3.1σ", "4.2 MAD-z"
+    if mad > 0:
+        centre, spread, k = median, mad, OUTLIER_MAD_Z
+        score_key, unit, centre_name, spread_name = "mad_z", " MAD-z", "median", "MAD scale"
+    else:
+        centre = float(amounts.mean())
+        spread = float(amounts.std(ddof=1))
+        k = OUTLIER_STD_DEVS
+        score_key, unit, centre_name, spread_name = "std_devs", "σ", "mean", "σ"
+    threshold = centre + k * spread
 
     flagged = []
     for t in txns:
         if (t.amount or 0) > threshold:
-            std_devs_away = round((t.amount - mean) / stdev, 1) if stdev > 0 else 0
+            score = round((t.amount - centre) / spread, 1) if spread > 0 else 0
             flagged.append({
                 "date": t.date,
                 "amount": t.amount,
-                "type": t.transaction_type,
-                "description": (t.description or "")[:80],
-                "std_devs": std_devs_away,
-                "explanation": f"This {t.transaction_type or 'transaction'} of {t.amount:,.2f} is "
-                               f"{std_devs_away}σ above the mean ({mean:,.2f}). "
-                               f"Amounts exceeding {OUTLIER_STD_DEVS}σ are statistically rare outliers "
+                "type": t.type,
+                "description": t.desc80,
+                score_key: score,
+                "explanation": f"This {t.type or 'transaction'} of {t.amount:,.2f} is "
+                               f"{score}{unit} above the {centre_name} ({centre:,.2f}). "
+                               f"Amounts exceeding {k}{unit} are statistically rare outliers "
                                f"that may warrant investigation for unusual activity.",
             })
 
@@ -207,16 +329,16 @@ def check_large_outliers(txns: List[RawTransaction]) -> dict:
     if not flagged:
         return {"check": name, "status": "pass",
                 "details": f"No outliers (threshold: {threshold:,.2f}, "
-                           f"mean: {mean:,.2f}, σ: {stdev:,.2f}).",
+                           f"{centre_name}: {centre:,.2f}, {spread_name}: {spread:,.2f}).",
                 "flagged_items": []}
 
     return {"check": name, "status": "fail" if len(flagged) >= 3 else "warning",
-            "details": f"{len(flagged)} transactions exceed {OUTLIER_STD_DEVS}σ above mean "
+            "details": f"{len(flagged)} transactions exceed {k}{unit} above {centre_name} "
                        f"(threshold: {threshold:,.2f}).",
             "flagged_items": flagged[:15]}
 
 
-def check_balance_anomalies(txns: List[RawTransaction]) -> dict:
+def check_balance_anomalies(txns: List[TxnView]) -> dict:
     """Check 5: Flag large sudden balance swings."""
     name = "Balance Anomalies"
     balances = [(t.date, t.balance) for t in txns if t.balance is not None]
@@ -261,11 +383,11 @@ def check_balance_anomalies(txns: List[RawTransaction]) -> dict:
             "flagged_items": flagged[:15]}
 
 
-def check_cash_heavy(txns: List[RawTransaction], metrics: Optional[StatementMetrics]) -> dict:
+def check_cash_heavy(txns: List[TxnView], metrics: Optional[StatementMetrics]) -> dict:
     """Check 6: Flag disproportionate cash activity."""
     name = "Cash-Heavy Activity"
-    total_credits = sum((t.amount or 0) for t in txns if t.transaction_type == "credit")
-    total_debits = sum((t.amount or 0) for t in txns if t.transaction_type == "debit")
+    total_credits = sum((t.amount or 0) for t in txns if t.type == "credit")
+    total_debits = sum((t.amount or 0) for t in txns if t.type == "debit")
     total_volume = total_credits + total_debits
 
     cash_deposits = 0.0
@@ -280,7 +402,7 @@ def check_cash_heavy(txns: List[RawTransaction], metrics: Optional[StatementMetr
         for t in txns:
             if t.is_cash:
                 cash_count += 1
-                if t.transaction_type == "credit":
+                if t.type == "credit":
                     cash_deposits += t.amount or 0
                 else:
                     cash_withdrawals += t.amount or 0
@@ -311,20 +433,11 @@ def check_cash_heavy(txns: List[RawTransaction], metrics: Optional[StatementMetr
                                               f"money laundering, or tax evasion."}]}
 
 
-def check_timing_patterns(txns: List[RawTransaction]) -> dict:
+def check_timing_patterns(agg: DayAggregates) -> dict:
     """Check 7: Flag unusual concentration at month edges."""
     name = "Unusual Timing Patterns"
-    edge_count = 0
-    mid_count = 0
-
-    for t in txns:
-        day = _parse_day(t.date)
-        if day is None:
-            continue
-        if day in MONTH_EDGE_DAYS:
-            edge_count += 1
-        else:
-            mid_count += 1
+    edge_count = agg.edge_count
+    mid_count = agg.mid_count
 
     total = edge_count + mid_count
     if total < 10:
@@ -351,48 +464,79 @@ def check_timing_patterns(txns: List[RawTransaction]) -> dict:
                                               f"or deliberate timing to manage reporting periods."}]}
 
 
-def check_counterparty_risk(txns: List[RawTransaction]) -> dict:
-    """Check 8: LLM assessment of counterparty names for suspicious entities."""
-    name = "Counterparty Risk Assessment"
-    # Gather unique counterparties with their total volume
+def _top_counterparties(txns: List[TxnView], n: int) -> tuple[list[tuple[str, float, int]], int]:
+    """Return the top-``n`` counterparties as (name, volume, count) plus the
+    number of distinct counterparties.
+
+    Large inputs are grouped with pandas when it is installed; otherwise (and
+    for small statements, where DataFrame setup dominates) a dict pass is used.
+    """
+    if pd is not None and len(txns) >= PANDAS_MIN_ROWS:
+        rows = [(t.cp60, t.amount or 0) for t in txns if len(t.cp60) >= 3]
+        if not rows:
+            return [], 0
+        df = pd.DataFrame(rows, columns=["cp", "amt"])
+        g = df.groupby("cp", sort=False).agg(vol=("amt", "sum"), cnt=("amt", "size"))
+        top = g.nlargest(n, "vol")
+        return [(cp, float(vol), int(cnt)) for cp, vol, cnt in top.itertuples()], len(g)
+
     cp_volume: dict[str, float] = defaultdict(float)
     cp_count: dict[str, int] = Counter()
-
     for t in txns:
-        cp = (t.counterparty or t.description or "").strip()
-        if not cp or len(cp) < 3:
+        cp_key = t.cp60
+        if len(cp_key) < 3:
             continue
-        cp_key = cp[:60].upper()
         cp_volume[cp_key] += t.amount or 0
         cp_count[cp_key] += 1
 
-    if not cp_volume:
+    top = sorted(cp_volume.items(), key=lambda x: x[1], reverse=True)[:n]
+    return [(cp, vol, cp_count[cp]) for cp, vol in top], len(cp_volume)
+
+
+# Counterparty prompt pieces are built once at import; only the list varies.
+_CP_LINE = "  %d. %s — %d txn(s), total %s"
+_CP_PROMPT_HEAD = (
+    "You are a fraud analyst reviewing bank statement counterparties. "
+    "Below are the top counterparties by transaction volume.\n\n"
+)
+_CP_PROMPT_TAIL = (
+    "\n\n"
+    "Identify any suspicious patterns:\n"
+    "- Shell company names (random letters, no real business name)\n"
+    "- Money service businesses or remittance companies\n"
+    "- Gambling or high-risk merchants\n"
+    "- Counterparties that appear to be personal accounts in a business statement\n"
+    "- Any other red flags\n\n"
+    "Respond ONLY with valid JSON (no markdown fences):\n"
+    '{"status": "pass" or "fail" or "warning", '
+    '"details": "brief assessment of counterparty risk", '
+    '"flagged_counterparties": ["name1", "name2"]}'
+)
+
+
+def check_counterparty_risk(txns: List[TxnView]) -> dict:
+    """Check 8: LLM assessment of counterparty names for suspicious entities."""
+    name = "Counterparty Risk Assessment"
+    # Top 30 counterparties by volume
+    top_cps, n_cps = _top_counterparties(txns, 30)
+
+    if not n_cps:
         return {"check": name, "status": "pass",
                 "details": "No counterparty data available.",
                 "flagged_items": []}
 
-    # Top 30 counterparties by volume
-    top_cps = sorted(cp_volume.items(), key=lambda x: x[1], reverse=True)[:30]
-    cp_list = "\n".join(
-        f"  {i+1}. {cp} — {cp_count[cp]} txn(s), total {vol:,.2f}"
-        for i, (cp, vol) in enumerate(top_cps)
-    )
-
-    prompt = (
-        "You are a fraud analyst reviewing bank statement counterparties. "
-        "Below are the top counterparties by transaction volume.\n\n"
-        f"{cp_list}\n\n"
-        "Identify any suspicious patterns:\n"
-        "- Shell company names (random letters, no real business name)\n"
-        "- Money service businesses or remittance companies\n"
-        "- Gambling or high-risk merchants\n"
-        "- Counterparties that appear to be personal accounts in a business statement\n"
-        "- Any other red flags\n\n"
-        "Respond ONLY with valid JSON (no markdown fences):\n"
-        '{"status": "pass" or "fail" or "warning", '
-        '"details": "brief assessment of counterparty risk", '
-        '"flagged_counterparties": ["name1", "name2"]}'
-    )
+    if n_cps < COUNTERPARTY_MIN_UNIQUE:
+        return {"check": name, "status": "pass",
+                "details": f"Only {n_cps} distinct counterparties — too few for a "
+                           f"meaningful counterparty risk assessment.",
+                "flagged_items": []}
+
+    cp_list = "\n".join([
+        _CP_LINE % (i, cp, cnt, format(vol, ",.2f"))
+        for i, (cp, vol, cnt) in enumerate(top_cps, 1)
+    ])
+
+    prompt = _CP_PROMPT_HEAD + cp_list + _CP_PROMPT_TAIL
 
     try:
         raw = chat_completion(
@@ -400,8 +544,7 @@ def check_counterparty_risk(txns: List[RawTransaction]) -> dict:
             temperature=0.1,
             max_tokens=500,
         )
-        raw = re.sub(r"^```json\s*|```\s*$", "", raw.strip()).strip()
-        parsed = json.loads(raw)
+        parsed = _parse_json_object(raw)
 
         return {
             "check": name,
@@ -415,6 +558,20 @@ def check_counterparty_risk(txns: List[RawTransaction]) -> dict:
                 "flagged_items": []}
 
 
+def _run_counterparty_check(checks: list[dict], views: List[TxnView]) -> dict:
+    """Run the LLM counterparty check unless the rule-based checks already
+    put the document at critical risk, in which case the narrative is moot."""
+    prelim_risk, _, _ = _compute_risk(checks)
+    if prelim_risk == "critical":
+        logger.info("  ⏭️  Skipping counterparty risk assessment (risk already critical)")
+        return {"check": "Counterparty Risk Assessment", "status": "skipped",
+                "details": "Bypassed — critical risk already established by rule checks.",
+                "flagged_items": []}
+
+    logger.info("  🤖 Running counterparty risk assessment (LLM)...")
+    return check_counterparty_risk(views)
+
+
 # ─── Risk Assessment ──────────────────────────────────────────────────────────
 
 def _compute_risk(checks: list[dict]) -> tuple[str, int, str]:
@@ -474,9 +631,12 @@ class FraudAgent(BaseAgent):
             }
 
         # ── Fetch extracted transactions ──────────────────────────────────
+        # Statement order (page, then insertion) — date strings vary by bank
+        # and do not sort chronologically as text.
         txns = (
-            db.query(RawTransaction)
+            db.query(*_TXN_COLUMNS)
             .filter(RawTransaction.document_id == document_id)
+            .order_by(RawTransaction.page_number, RawTransaction.created_at)
             .all()
         )
         metrics = (
@@ -494,23 +654,23 @@ class FraudAgent(BaseAgent):
             }
 
         logger.info(f"  📊 Analysing {len(txns)} transactions for fraud signals...")
+        views, agg = _build_views(txns)
 
         # ── Run all checks ────────────────────────────────────────────────
         checks: list[dict] = []
 
         # Rule-based checks (fast, no LLM)
         logger.info("  🔢 Running rule-based fraud checks...")
-        checks.append(check_round_amounts(txns))
-        checks.append(check_duplicates(txns))
-        checks.append(check_rapid_succession(txns))
-        checks.append(check_large_outliers(txns))
-        checks.append(check_balance_anomalies(txns))
-        checks.append(check_cash_heavy(txns, metrics))
-        checks.append(check_timing_patterns(txns))
+        checks.append(check_round_amounts(views))
+        checks.append(check_duplicates(views))
+        checks.append(check_rapid_succession(agg))
+        checks.append(check_large_outliers(views))
+        checks.append(check_balance_anomalies(views))
+        checks.append(check_cash_heavy(views, metrics))
+        checks.append(check_timing_patterns(agg))
 
         # LLM-powered check (last)
-        logger.info("  🤖 Running counterparty risk assessment (LLM)...")
-        checks.append(check_counterparty_risk(txns))
+        checks.append(_run_counterparty_check(checks, views))
 
         # ── Compute risk ──────────────────────────────────────────────────
         risk_level, risk_score, summary = _compute_risk(checks)
@@ -541,8 +701,14 @@ class FraudAgent(BaseAgent):
 
         # ── Fetch ALL transactions across the group ──
         txns = (
-            db.query(RawTransaction)
+            db.query(*_TXN_COLUMNS)
+            .outerjoin(StatementMetrics,
+                       StatementMetrics.document_id == RawTransaction.document_id)
             .filter(RawTransaction.upload_group_id == upload_group_id)
+            .order_by(StatementMetrics.statement_period,
+                      RawTransaction.document_id,
+                      RawTransaction.page_number,
+                      RawTransaction.created_at)
             .all()
         )
         all_metrics = (
@@ -565,6 +731,8 @@ class FraudAgent(BaseAgent):
             f"for fraud signals..."
         )
 
+        views, agg = _build_views(txns)
+
         # ── Run all checks on combined transactions ──
         checks: list[dict] = []
 
@@ -572,21 +740,20 @@ class FraudAgent(BaseAgent):
         combined_metrics = all_metrics[0] if all_metrics else None
 
         logger.info("  🔢 Running rule-based fraud checks (cross-statement)...")
-        checks.append(check_round_amounts(txns))
-        checks.append(check_duplicates(txns))
-        checks.append(check_rapid_succession(txns))
-        checks.append(check_large_outliers(txns))
-        checks.append(check_balance_anomalies(txns))
-        checks.append(check_cash_heavy(txns, combined_metrics))
-        checks.append(check_timing_patterns(txns))
+        checks.append(check_round_amounts(views))
+        checks.append(check_duplicates(views))
+        checks.append(check_rapid_succession(agg))
+        checks.append(check_large_outliers(views))
+        checks.append(check_balance_anomalies(views))
+        checks.append(check_cash_heavy(views, combined_metrics))
+        checks.append(check_timing_patterns(agg))
 
         # Cross-statement specific check: balance continuity between statements
         if len(all_metrics) >= 2:
             checks.append(self._check_cross_statement_balance(all_metrics))
 
         # LLM counterparty check on combined data
-        logger.info("  🤖 Running counterparty risk assessment (LLM)...")
-        checks.append(check_counterparty_risk(txns))
+        checks.append(_run_counterparty_check(checks, views))
 
         # ── Compute risk ──
         risk_level, risk_score, summary = _compute_risk(checks)
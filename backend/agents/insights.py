@@ -13,63 +13,404 @@ Analyzes:
 """
 from __future__ import annotations
 
+import copy
+import functools
+import heapq
 import json
 import logging
-import re
-from collections import Counter, defaultdict
+import operator
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Union
 
+import numpy as np
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover — orjson is an optional speed-up
+    _json_loads = json.loads
+
+from agents._dates import MONTH_MAP, parse_day, parse_month
+from agents._kernels import large_indices
 from agents.base import BaseAgent
-from models import Document, RawTransaction, StatementMetrics, AggregatedMetrics
+from models import (
+    AgentResult, AgentStatus, AgentType, AggregatedMetrics, Document, RawTransaction,
+    StatementMetrics,
+)
 from services.llm_client import chat_completion
 
 logger = logging.getLogger("ThirdEye.Agent.Insights")
 
-# ─── Month ordering for Singapore bank statements ─────────────────────────────
 
-MONTH_MAP = {
-    "JAN": 1, "FEB": 2, "MAR": 3, "APR": 4, "MAY": 5, "JUN": 6,
-    "JUL": 7, "AUG": 8, "SEP": 9, "OCT": 10, "NOV": 11, "DEC": 12,
-}
+# Counterparty values that carry no name (compared casefolded)
+_BLANK_COUNTERPARTIES = frozenset({"", "unknown", "n/a", "none", "-"})
+
+
+def _counterparty_key(raw: str) -> Optional[str]:
+    """Cleaned, interned counterparty name, or None for blank placeholders."""
+    cp = raw.strip()
+    return None if cp.casefold() in _BLANK_COUNTERPARTIES else sys.intern(cp)
+
+
+def _round_all(values, decimals: int = 2) -> list:
+    """Round a batch of floats in one NumPy pass and return plain Python floats."""
+    return np.round(np.asarray(values, dtype=np.float64), decimals).tolist()
+
+
+WEEK_LABELS = ("week_1 (1-7)", "week_2 (8-14)", "week_3 (15-21)", "week_4 (22-31)")
+
+LARGE_TXN_FACTOR = 3.0          # flag amounts ≥ 3x the side's average
+LARGE_TXN_MIN_SAMPLES = 5       # fewer debits/credits than this = skip the scan
+
+
+# ─── Single-pass aggregation ──────────────────────────────────────────────────
+
+# Only the columns the insight sections read — fetched as plain rows rather
+# than hydrated ORM objects.  NULL/empty defaults are applied in SQL so the
+# aggregation loop can use the values as-is.  ``balance`` stays nullable:
+# a missing balance is not a zero balance.
+_TXN_COLUMNS = (
+    func.coalesce(RawTransaction.amount, 0.0).label("amount"),
+    RawTransaction.transaction_type,
+    RawTransaction.date,
+    func.coalesce(func.nullif(RawTransaction.category, ""), "other").label("category"),
+    func.coalesce(RawTransaction.counterparty, "").label("counterparty"),
+    func.coalesce(func.nullif(RawTransaction.channel, ""), "Unknown").label("channel"),
+    RawTransaction.balance,
+    RawTransaction.description,
+    RawTransaction.day,
+    RawTransaction.month,
+)
+
+
+@dataclass(slots=True)
+class TxnAggregates:
+    """Accumulators filled in ONE pass over the transactions.
+
+    Every insight section reads from here instead of re-iterating the rows,
+    so each attribute is fetched and each date parsed only once.  Per-row
+    values are also kept column-wise (struct-of-arrays) for vectorised scans.
+    """
+    n: int = 0
+    active_days: int = 0                       # distinct parsed days-of-month
+    # per-row columns
+    amounts: Optional[np.ndarray] = None       # float64, NULL → 0
+    is_credit: Optional[np.ndarray] = None     # bool
+    is_debit: Optional[np.ndarray] = None      # bool
+    days: Optional[np.ndarray] = None          # int64 day-of-month, -1 = unparsed
+    cat_codes: Optional[np.ndarray] = None     # int64 index into ``categories``
+    balances: Optional[np.ndarray] = None      # float64, NULL → NaN
+    date_codes: Optional[np.ndarray] = None    # int64, equal raw date strings share a code
+    dates: list = field(default_factory=list)
+    date_values: list = field(default_factory=list)    # date code → raw date string
+    descriptions: list = field(default_factory=list)
+    types: list = field(default_factory=list)          # raw transaction_type
+    categories: list = field(default_factory=list)     # code → category name
+    category_labels: list = field(default_factory=list)  # code → display label
+    # counterparties
+    vendor_count: Counter = field(default_factory=Counter)
+    vendor_total: Counter = field(default_factory=Counter)
+    customer_count: Counter = field(default_factory=Counter)
+    customer_total: Counter = field(default_factory=Counter)
+    # channels
+    channel_codes: Optional[np.ndarray] = None  # int64 index into ``channels``
+    channels: list = field(default_factory=list)       # code → stripped channel name
+    # monthly trends (group runs only)
+    month_codes: Optional[np.ndarray] = None   # int64 index into ``months``, -1 = unparsed
+    months: list = field(default_factory=list)         # code → month abbreviation
+
+
+def _aggregate(transactions, with_months: bool = False) -> TxnAggregates:
+    """Walk the transactions once and fill every section's accumulators.
+
+    ``transactions`` are rows from a ``_TXN_COLUMNS`` query, so amount,
+    category, counterparty and channel are never NULL.
+    """
+    agg = TxnAggregates()
+    cp_cache: Dict[str, Optional[str]] = {}
+    cat_index: Dict[str, int] = {}
+    date_index: Dict[Optional[str], int] = {}
+    date_months: List[Optional[str]] = []        # stored month of each distinct date
+    ch_index: Dict[str, int] = {}                 # stripped channel → code
+    ch_cache: Dict[str, int] = {}                 # raw channel → code
+    amounts, days, balances, cat_codes, date_codes, ch_codes = [], [], [], [], [], []
+    ttypes = agg.types
+
+    # Bound once: attribute/global lookups are the dominant per-row cost
+    add_amount, add_type, add_day = amounts.append, ttypes.append, days.append
+    add_balance, add_cat, add_date_code = balances.append, cat_codes.append, date_codes.append
+    add_date, add_desc = agg.dates.append, agg.descriptions.append
+    vendor_count, vendor_total = agg.vendor_count, agg.vendor_total
+    customer_count, customer_total = agg.customer_count, agg.customer_total
+    add_ch_code = ch_codes.append
+
+    for t in transactions:
+        amt = t.amount
+        ttype = t.transaction_type
+        date = t.date
+        is_credit = ttype == "credit"
+        is_debit = ttype == "debit"
+
+        day = t.day
+        if day is None:                     # rows stored before day/month existed
+            day = parse_day(date)
+
+        add_amount(amt)
+        add_type(ttype)
+        add_day(-1 if day is None else day)
+        add_balance(t.balance)
+        add_date(date)
+        add_desc(t.description)
+        date_code = date_index.get(date)
+        if date_code is None:
+            date_code = date_index[date] = len(date_index)
+            date_months.append(t.month)
+        add_date_code(date_code)
+
+        # Categories (coded for bincount)
+        cat = t.category
+        code = cat_index.get(cat)
+        if code is None:
+            code = cat_index[cat] = len(cat_index)
+            agg.categories.append(cat)
+            agg.category_labels.append(CATEGORY_LABELS.get(cat, cat.title()))
+        add_cat(code)
+
+        # Counterparties
+        raw_cp = t.counterparty
+        if raw_cp in cp_cache:
+            cp = cp_cache[raw_cp]
+        else:
+            cp = cp_cache[raw_cp] = _counterparty_key(raw_cp)
+        if cp:
+            if is_debit:
+                vendor_count[cp] += 1
+                vendor_total[cp] += amt
+            elif is_credit:
+                customer_count[cp] += 1
+                customer_total[cp] += amt
+
+        # Channels
+        raw_ch = t.channel
+        ch_code = ch_cache.get(raw_ch)
+        if ch_code is None:
+            ch_code = ch_cache[raw_ch] = ch_index.setdefault(raw_ch.strip(), len(ch_index))
+        add_ch_code(ch_code)
+
+    agg.n = len(amounts)
+    ttype_arr = np.array(ttypes, dtype=object)
+    agg.amounts = np.array(amounts, dtype=np.float64)
+    agg.is_credit = ttype_arr == "credit"
+    agg.is_debit = ttype_arr == "debit"
+    agg.days = np.array(days, dtype=np.int64)
+    agg.active_days = int(np.unique(agg.days[agg.days > 0]).size)
+    agg.cat_codes = np.array(cat_codes, dtype=np.int64)
+    agg.balances = np.array(balances, dtype=np.float64)   # None → NaN
+    agg.date_codes = np.array(date_codes, dtype=np.int64)
+    agg.date_values = list(date_index)
+    agg.channel_codes = np.array(ch_codes, dtype=np.int64)
+    agg.channels = list(ch_index)
+
+    # Monthly trends: resolve each distinct date's month once, then map rows through it
+    if with_months:
+        month_index: Dict[str, int] = {}
+        date_month = np.array([
+            month_index.setdefault(month, len(month_index)) if month else -1
+            for month in (
+                stored or parse_month(date) for date, stored in zip(date_index, date_months)
+            )
+        ], dtype=np.int64)
+        agg.months = list(month_index)
+        agg.month_codes = date_month[agg.date_codes]
+    return agg
+
+
+# ─── Prompt tables ────────────────────────────────────────────────────────────
+
+def _fmt_rows(rows: List[dict], cols: tuple) -> str:
+    """Render ``rows`` as a compact pipe-separated table for an LLM prompt.
+
+    Far fewer tokens than pretty-printed JSON, which repeats every key on
+    every row.
+    """
+    if not rows:
+        return "(none)"
+    lines = [" | ".join(cols)]
+    lines.extend(" | ".join(str(row.get(c, "")) for c in cols) for row in rows)
+    return "\n".join(lines)
+
+
+def _fmt_kv(values: dict) -> str:
+    """Render a flat dict as ``- key: value`` lines for an LLM prompt."""
+    if not values:
+        return "(none)"
+    return "\n".join(f"- {k}: {v}" for k, v in values.items())
+
+
+_CATEGORY_COLS = ("label", "count", "total", "percentage")
+_COUNTERPARTY_COLS = ("name", "count", "total")
+_MONTH_COLS = ("month", "total_credits", "total_debits", "net_flow", "credit_count", "debit_count")
+
+
+# ─── Narrative prompts ────────────────────────────────────────────────────────
+# Parsed once at import and filled with ``str.format_map``.  The group prompt
+# keeps its fixed instructions ahead of the data so repeated calls share a
+# prompt prefix.
+
+_NARRATIVE_PROMPT = """You are a senior financial analyst reviewing a business bank statement.
+Generate a concise but insightful narrative analysis based on the data below.
+
+**Account**: {account_holder} at {bank}
+**Period**: {period}
+**Opening Balance**: {opening_balance:,.2f}
+**Closing Balance**: {closing_balance:,.2f}
+**Total Transactions**: {total_transactions}
+
+**Category Breakdown (Top Debits)**:
+{debit_categories}
+
+**Top Vendors**:
+{top_vendors}
+
+**Top Customers/Senders**:
+{top_customers}
+
+**Cash Flow**:
+- Total Inflow: {total_inflow:,.2f}
+- Total Outflow: {total_outflow:,.2f}
+- Net Flow: {net_flow:,.2f}
+- Peak Inflow Day: {peak_inflow_day}
+- Peak Outflow Day: {peak_outflow_day}
+
+**Business Health Score**: {health_score}/100 — {health_assessment}
+**Key Indicators**:
+{indicators}
+
+**Unusual Transactions**: {total_flags} flags detected
+- Large transactions: {large_count}
+- Same-day large movements: {same_day_count}
+- Low balance events: {low_balance_count}
+
+**Assessed Risk Level**: {risk_level}
+
+Return a JSON object with these keys:
+{{
+  "executive_summary": "2-3 sentence high-level summary",
+  "spending_analysis": "3-4 sentences on spending patterns and major expense categories",
+  "income_analysis": "2-3 sentences on income sources and patterns",
+  "cash_flow_assessment": "2-3 sentences on cash flow health, burn rate, and trajectory",
+  "risk_observations": "2-3 sentences on any concerning patterns or red flags",
+  "risk_rationale": "1-2 sentences explaining the assessed risk level from the data above",
+  "recommendations": ["recommendation 1", "recommendation 2", "recommendation 3"]
+}}
+"""
+
+_GROUP_NARRATIVE_PROMPT = """You are a senior financial analyst reviewing MULTIPLE bank statements for the same customer.
+Generate a comprehensive narrative analysis covering the full period.
+Each statement has already been analysed on its own; build on those per-statement
+summaries (listed last) instead of repeating them.
+
+Return a JSON object with these keys:
+{{
+  "executive_summary": "3-4 sentence high-level summary covering the full period",
+  "spending_analysis": "3-4 sentences on spending patterns and trends across months",
+  "income_analysis": "2-3 sentences on income stability and sources",
+  "cash_flow_assessment": "3-4 sentences on cash flow trajectory and sustainability",
+  "trend_analysis": "2-3 sentences on month-over-month trends and patterns",
+  "risk_observations": "2-3 sentences on concerning patterns across statements",
+  "risk_rationale": "1-2 sentences explaining the assessed risk level from the data below",
+  "recommendations": ["recommendation 1", "recommendation 2", "recommendation 3", "recommendation 4"]
+}}
+
+**Account**: {account_holder} at {bank}
+**Period**: {period}
+**Total Statements**: {total_statements}
+**Total Transactions**: {total_transactions}
+**Opening Balance (first statement)**: {opening_balance:,.2f}
+**Closing Balance (last statement)**: {closing_balance:,.2f}
+
+**Category Breakdown (Top Debits)**:
+{debit_categories}
+
+**Top Vendors**:
+{top_vendors}
+
+**Cash Flow**:
+- Total Inflow: {total_inflow:,.2f}
+- Total Outflow: {total_outflow:,.2f}
+- Net Flow: {net_flow:,.2f}
+
+**Monthly Trends**:
+{monthly_flow}
+
+**Business Health Score**: {health_score}/100 — {health_assessment}
+**Assessed Risk Level**: {risk_level}
+
+**Per-Statement Summaries**:
+{statement_summaries}
+"""
 
 
-def _parse_day(date_str: str) -> Optional[int]:
-    """Extract day number from date string like '01 DEC', '15 JAN', '01-Sep-2025', '01/12/2025'."""
-    if not date_str:
-        return None
-    date_str = date_str.strip()
-    # Try DD-MMM-YYYY (DBS format: 01-Sep-2025)
-    m = re.match(r'(\d{1,2})[\-/][A-Za-z]{3}', date_str)
-    if m:
-        return int(m.group(1))
-    # Try DD MMM (OCBC/UOB format: 01 DEC)
-    parts = date_str.split()
-    if parts and parts[0].isdigit():
-        return int(parts[0])
-    # Try DD/MM/YYYY
-    m = re.match(r'(\d{1,2})/\d{1,2}', date_str)
-    if m:
-        return int(m.group(1))
-    return None
-
-
-def _parse_month(date_str: str) -> Optional[str]:
-    """Extract month abbreviation from date string."""
-    if not date_str:
-        return None
-    date_str = date_str.strip().upper()
-    # Try DD-MMM-YYYY (e.g. 01-SEP-2025)
-    m = re.match(r'\d{1,2}[\-/]([A-Z]{3})', date_str)
-    if m and m.group(1) in MONTH_MAP:
-        return m.group(1)
-    # Try DD MMM (e.g. 01 DEC)
-    parts = date_str.split()
-    for p in parts:
-        if p in MONTH_MAP:
-            return p
-    return None
+NARRATIVE_FAILED = "Narrative generation failed — see structured data for insights."
+
+
+def _narrative_fields(data: dict) -> dict:
+    """Values shared by both narrative prompt templates."""
+    cash_flow = data["cash_flow"]
+    health = data["business_health"]
+    unusual = data["unusual_transactions"]
+    return {
+        "account_holder": data["account_holder"],
+        "bank": data["bank"],
+        "period": data["period"],
+        "opening_balance": data["opening_balance"] or 0,
+        "closing_balance": data["closing_balance"] or 0,
+        "total_transactions": data["total_transactions"],
+        "debit_categories": _fmt_rows(data["category_breakdown"]["debit_categories"][:5], _CATEGORY_COLS),
+        "top_vendors": _fmt_rows(data["top_counterparties"]["top_vendors"][:8], _COUNTERPARTY_COLS),
+        "top_customers": _fmt_rows(data["top_counterparties"]["top_customers"][:5], _COUNTERPARTY_COLS),
+        "total_inflow": cash_flow.get("total_inflow") or 0,
+        "total_outflow": cash_flow.get("total_outflow") or 0,
+        "net_flow": cash_flow.get("net_flow") or 0,
+        "peak_inflow_day": cash_flow.get("peak_inflow_day"),
+        "peak_outflow_day": cash_flow.get("peak_outflow_day"),
+        "health_score": health["score"],
+        "health_assessment": health["assessment"],
+        "indicators": _fmt_kv(health["indicators"]),
+        "total_flags": unusual["total_flags"],
+        "large_count": len(unusual["large_transactions"]),
+        "same_day_count": len(unusual["same_day_large_movements"]),
+        "low_balance_count": len(unusual["low_balance_events"]),
+        "risk_level": data["risk_level"],
+    }
+
+
+@functools.lru_cache(maxsize=128)
+def _cached_narrative(prompt: str, max_tokens: int) -> dict:
+    # Parsed inside the cache: a failed call or an unparseable reply raises
+    # here and is never stored.
+    return _json_loads(chat_completion(
+        messages=[
+            {"role": "system", "content": "You are a senior financial analyst. Return ONLY valid JSON."},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.3,
+        max_tokens=max_tokens,
+        response_format={"type": "json_object"},
+    ))
+
+
+def _narrative_json(prompt: str, max_tokens: int) -> dict:
+    """Parsed LLM narrative for a prompt.
+
+    An identical prompt means identical inputs (e.g. re-running an unchanged
+    statement or group), so the parsed reply is served from memory.  Each
+    caller gets its own copy, so the cached value cannot be mutated.
+    """
+    return copy.deepcopy(_cached_narrative(prompt, max_tokens))
 
 
 # ─── Category labels for display ──────────────────────────────────────────────
@@ -93,6 +434,56 @@ CATEGORY_LABELS = {
 }
 
 
+# ─── Scoring rules ────────────────────────────────────────────────────────────
+# (signal, comparison, threshold, points) — every matching rule contributes
+# its points to a neutral score of 50.  Relative balance checks are phrased
+# as differences so each rule compares against a constant.
+
+_GE, _GT, _LT = operator.ge, operator.gt, operator.lt
+
+HEALTH_RULES = (
+    # Positive signals
+    ("coverage", _GE, 1.0, 10),
+    ("coverage", _GE, 0.8, 5),
+    ("balance_change", _GE, 0, 10),             # closing >= opening
+    ("runway", _GE, 0.5, 5),
+    ("runway", _GE, 1.0, 5),
+    ("min_balance_cover_days", _GE, 3, 5),
+    # Negative signals
+    ("coverage", _LT, 0.5, -15),
+    ("closing_less_half_opening", _LT, 0, -10),  # closing < opening * 0.5
+    ("min_balance", _LT, 5000, -10),
+    ("cash_ratio", _GT, 30, -5),
+    ("runway", _LT, 0.1, -10),
+)
+
+GROUP_HEALTH_RULES = (
+    ("coverage", _GE, 1.0, 10),
+    ("coverage", _GE, 0.8, 5),
+    ("balance_change", _GT, 0, 10),
+    ("runway", _GE, 0.5, 5),
+    ("runway", _GE, 1.0, 5),
+    ("coverage", _LT, 0.5, -15),
+    ("balance_change_past_floor", _LT, 0, -10),  # lost more than 30% of opening
+    ("runway", _LT, 0.2, -10),
+)
+
+# (min health score, max unusual flags, risk level) — first match wins
+RISK_TIERS = (
+    (70, 5, "low"),
+    (50, 15, "medium"),
+    (30, float("inf"), "high"),
+)
+
+
+def _health_score(signals: dict, rules: tuple) -> int:
+    """Apply a rule table to ``signals`` and clamp the result to 0-100."""
+    score = 50 + sum(
+        points for key, cmp, threshold, points in rules if cmp(signals[key], threshold)
+    )
+    return max(0, min(100, score))
+
+
 class InsightsAgent(BaseAgent):
     """Generates business intelligence insights from extracted transaction data."""
 
@@ -105,7 +496,7 @@ class InsightsAgent(BaseAgent):
             return self._error("Document not found")
 
         transactions = (
-            db.query(RawTransaction)
+            db.query(*_TXN_COLUMNS)
             .filter(RawTransaction.document_id == document_id)
             .all()
         )
@@ -120,14 +511,17 @@ class InsightsAgent(BaseAgent):
 
         logger.info(f"  📊 Analyzing {len(transactions)} transactions...")
 
+        # ── Single pass over the transactions ─────────────────────────────
+        agg = _aggregate(transactions)
+
         # ── Build all insight sections ────────────────────────────────────
-        category_breakdown = self._category_analysis(transactions)
-        cash_flow = self._cash_flow_analysis(transactions, metrics)
-        top_counterparties = self._counterparty_analysis(transactions)
-        unusual_txns = self._unusual_transaction_detection(transactions, metrics)
-        day_patterns = self._day_of_month_patterns(transactions)
-        channel_analysis = self._channel_analysis(transactions)
-        business_health = self._business_health_indicators(transactions, metrics)
+        category_breakdown = self._category_analysis(agg)
+        cash_flow = self._cash_flow_analysis(agg, metrics)
+        top_counterparties = self._counterparty_analysis(agg)
+        unusual_txns = self._unusual_transaction_detection(agg, metrics)
+        day_patterns = self._day_of_month_patterns(agg)
+        channel_analysis = self._channel_analysis(agg)
+        business_health = self._business_health_indicators(agg, metrics)
 
         # ── Prepare data for LLM narrative ────────────────────────────────
         insights_data = {
@@ -141,18 +535,19 @@ class InsightsAgent(BaseAgent):
             "cash_flow": cash_flow,
             "top_counterparties": top_counterparties,
             "unusual_transactions": unusual_txns,
-            "day_patterns": day_patterns,
-            "channel_analysis": channel_analysis,
             "business_health": business_health,
         }
 
+        # ── Determine risk level ──────────────────────────────────────────
+        # Rule-based, so it is settled before the LLM call and the narrative
+        # explains it in the same round-trip.
+        risk_level = self._assess_risk(insights_data)
+        insights_data["risk_level"] = risk_level
+
         # ── LLM narrative summary ─────────────────────────────────────────
         logger.info("  🤖 Generating LLM narrative...")
         narrative = self._generate_llm_narrative(insights_data)
 
-        # ── Determine risk level ──────────────────────────────────────────
-        risk_level = self._assess_risk(insights_data)
-
         # ── Build final results ───────────────────────────────────────────
         results = {
             "category_breakdown": category_breakdown,
@@ -191,12 +586,6 @@ class InsightsAgent(BaseAgent):
         """
         logger.info(f"📊 Group insights agent running for group {upload_group_id}")
 
-        # ── Fetch ALL transactions across the group ──
-        transactions = (
-            db.query(RawTransaction)
-            .filter(RawTransaction.upload_group_id == upload_group_id)
-            .all()
-        )
         all_metrics = (
             db.query(StatementMetrics)
             .filter(StatementMetrics.upload_group_id == upload_group_id)
@@ -208,29 +597,52 @@ class InsightsAgent(BaseAgent):
             .filter(AggregatedMetrics.upload_group_id == upload_group_id)
             .first()
         )
+        # Executive summaries already written by each document's run()
+        doc_summaries = dict(
+            db.query(
+                AgentResult.document_id,
+                AgentResult.results[("narrative", "executive_summary")].as_string(),
+            )
+            .filter(
+                AgentResult.upload_group_id == upload_group_id,
+                AgentResult.agent_type == AgentType.INSIGHTS.value,
+                AgentResult.status == AgentStatus.COMPLETED.value,
+            )
+            .all()
+        )
 
-        if not transactions:
+        # ── Stream ALL transactions across the group through a single pass ──
+        # (incl. monthly buckets).  Rows arrive in batches, so a large group
+        # is never held as one list of result rows.
+        transactions = (
+            db.query(*_TXN_COLUMNS)
+            .filter(RawTransaction.upload_group_id == upload_group_id)
+            .yield_per(1000)
+        )
+        agg = _aggregate(transactions, with_months=True)
+
+        if not agg.n:
             return self._error("No transactions found across group — run extraction first")
 
         total_docs = len(all_metrics)
         logger.info(
-            f"  📊 Analyzing {len(transactions)} transactions across {total_docs} statements..."
+            f"  📊 Analyzed {agg.n} transactions across {total_docs} statements..."
         )
 
         # ── Build all insight sections (using all transactions) ──
         combined_metrics = all_metrics[0] if all_metrics else None
-        category_breakdown = self._category_analysis(transactions)
-        cash_flow = self._cash_flow_analysis(transactions, combined_metrics)
-        top_counterparties = self._counterparty_analysis(transactions)
-        unusual_txns = self._unusual_transaction_detection(transactions, combined_metrics)
-        day_patterns = self._day_of_month_patterns(transactions)
-        channel_analysis = self._channel_analysis(transactions)
+        category_breakdown = self._category_analysis(agg)
+        cash_flow = self._cash_flow_analysis(agg, combined_metrics)
+        top_counterparties = self._counterparty_analysis(agg)
+        unusual_txns = self._unusual_transaction_detection(agg, combined_metrics)
+        day_patterns = self._day_of_month_patterns(agg)
+        channel_analysis = self._channel_analysis(agg)
 
         # ── Monthly trends across statements ──
-        monthly_trends = self._monthly_trends(transactions, all_metrics)
+        monthly_trends = self._monthly_trends(agg, all_metrics)
 
         # ── Combined business health (use aggregated metrics) ──
-        business_health = self._group_business_health(transactions, all_metrics, agg_metrics)
+        business_health = self._group_business_health(agg, all_metrics, agg_metrics)
 
         # ── Per-statement summary ──
         per_statement = []
@@ -258,26 +670,30 @@ class InsightsAgent(BaseAgent):
             "period": agg_metrics.period_covered if agg_metrics else "Multiple statements",
             "opening_balance": all_metrics[0].opening_balance if all_metrics else 0,
             "closing_balance": all_metrics[-1].closing_balance if all_metrics else 0,
-            "total_transactions": len(transactions),
+            "total_transactions": agg.n,
             "total_statements": total_docs,
             "category_breakdown": category_breakdown,
             "cash_flow": cash_flow,
             "top_counterparties": top_counterparties,
             "unusual_transactions": unusual_txns,
-            "day_patterns": day_patterns,
-            "channel_analysis": channel_analysis,
             "business_health": business_health,
             "monthly_trends": monthly_trends,
+            "statement_summaries": [
+                (m.statement_period, doc_summaries[m.document_id])
+                for m in all_metrics
+                if doc_summaries.get(m.document_id) not in (None, "", NARRATIVE_FAILED)
+            ],
         }
 
+        risk_level = self._assess_risk(insights_data)
+        insights_data["risk_level"] = risk_level
+
         logger.info("  🤖 Generating group LLM narrative...")
         narrative = self._generate_group_narrative(insights_data)
 
-        risk_level = self._assess_risk(insights_data)
-
         results = {
             "total_statements": total_docs,
-            "total_transactions": len(transactions),
+            "total_transactions": agg.n,
             "per_statement_summary": per_statement,
             "category_breakdown": category_breakdown,
             "cash_flow": cash_flow,
@@ -292,7 +708,7 @@ class InsightsAgent(BaseAgent):
 
         summary_parts = [
             f"Statements: {total_docs}",
-            f"Transactions: {len(transactions)}",
+            f"Transactions: {agg.n}",
             f"Net cash flow: {(cash_flow.get('net_flow') or 0):,.2f}",
             f"Top category: {category_breakdown.get('top_debit_category', 'N/A')}",
             f"Risk: {risk_level}",
@@ -307,36 +723,33 @@ class InsightsAgent(BaseAgent):
             "risk_level": risk_level,
         }
 
-    def _monthly_trends(self, transactions: List[RawTransaction], all_metrics: list) -> dict:
+    def _monthly_trends(self, agg: TxnAggregates, all_metrics: list) -> dict:
         """Compute monthly trends across multiple statements."""
-        monthly_data = defaultdict(lambda: {
-            "credits": 0.0, "debits": 0.0, "credit_count": 0, "debit_count": 0,
-        })
-
-        for t in transactions:
-            month = _parse_month(t.date)
-            if not month:
-                continue
-            if t.transaction_type == "credit":
-                monthly_data[month]["credits"] += t.amount or 0
-                monthly_data[month]["credit_count"] += 1
-            elif t.transaction_type == "debit":
-                monthly_data[month]["debits"] += t.amount or 0
-                monthly_data[month]["debit_count"] += 1
+        n_months = len(agg.months)
+        codes = agg.month_codes
+        credit = agg.is_credit & (codes >= 0)
+        debit = agg.is_debit & (codes >= 0)
+        credits = np.bincount(codes[credit], weights=agg.amounts[credit], minlength=n_months)
+        debits = np.bincount(codes[debit], weights=agg.amounts[debit], minlength=n_months)
+        credit_counts = np.bincount(codes[credit], minlength=n_months).tolist()
+        debit_counts = np.bincount(codes[debit], minlength=n_months).tolist()
+        credits_r = np.round(credits, 2).tolist()
+        debits_r = np.round(debits, 2).tolist()
+        net_r = np.round(credits - debits, 2).tolist()
 
         # Sort by month order
-        sorted_months = sorted(monthly_data.keys(), key=lambda m: MONTH_MAP.get(m, 0))
-        monthly_flow = []
-        for month in sorted_months:
-            d = monthly_data[month]
-            monthly_flow.append({
-                "month": month,
-                "total_credits": round(d["credits"], 2),
-                "total_debits": round(d["debits"], 2),
-                "net_flow": round(d["credits"] - d["debits"], 2),
-                "credit_count": d["credit_count"],
-                "debit_count": d["debit_count"],
-            })
+        sorted_codes = sorted(range(n_months), key=lambda c: MONTH_MAP.get(agg.months[c], 0))
+        monthly_flow = [
+            {
+                "month": agg.months[c],
+                "total_credits": credits_r[c],
+                "total_debits": debits_r[c],
+                "net_flow": net_r[c],
+                "credit_count": credit_counts[c],
+                "debit_count": debit_counts[c],
+            }
+            for c in sorted_codes
+        ]
 
         # Balance trajectory from per-statement metrics
         balance_trajectory = []
@@ -352,12 +765,12 @@ class InsightsAgent(BaseAgent):
         return {
             "monthly_flow": monthly_flow,
             "balance_trajectory": balance_trajectory,
-            "total_months": len(sorted_months),
+            "total_months": n_months,
         }
 
     def _group_business_health(
         self,
-        transactions: List[RawTransaction],
+        agg: TxnAggregates,
         all_metrics: list,
         agg_metrics,
     ) -> dict:
@@ -367,9 +780,16 @@ class InsightsAgent(BaseAgent):
 
         indicators = {}
 
+        # One walk over the statements; everything below reduces these lists
+        credits, debits, closings = [], [], []
+        for m in all_metrics:
+            credits.append(m.total_amount_of_credit_transactions or 0)
+            debits.append(m.total_amount_of_debit_transactions or 0)
+            closings.append(m.closing_balance or 0)
+
         # Overall balance trend
         first_opening = all_metrics[0].opening_balance or 0
-        last_closing = all_metrics[-1].closing_balance or 0
+        last_closing = closings[-1]
         balance_change = last_closing - first_opening
         indicators["overall_balance_change"] = round(balance_change, 2)
         indicators["overall_balance_change_pct"] = (
@@ -378,8 +798,8 @@ class InsightsAgent(BaseAgent):
         indicators["balance_trend"] = "growing" if balance_change > 0 else "declining"
 
         # Total volume across all statements
-        total_in = sum(m.total_amount_of_credit_transactions or 0 for m in all_metrics)
-        total_out = sum(m.total_amount_of_debit_transactions or 0 for m in all_metrics)
+        total_in = sum(credits)
+        total_out = sum(debits)
         indicators["total_credits_all"] = round(total_in, 2)
         indicators["total_debits_all"] = round(total_out, 2)
         indicators["revenue_coverage_ratio"] = round(total_in / total_out, 3) if total_out else 0
@@ -396,38 +816,23 @@ class InsightsAgent(BaseAgent):
         indicators["cash_runway_months"] = round(runway, 2)
 
         # Balance volatility
-        closings = [m.closing_balance or 0 for m in all_metrics]
         if len(closings) > 1:
-            import statistics as stats
-            indicators["balance_std_dev"] = round(stats.stdev(closings), 2)
-            indicators["balance_cv"] = round(
-                stats.stdev(closings) / stats.mean(closings) * 100, 1
-            ) if stats.mean(closings) > 0 else 0
+            closing_arr = np.array(closings, dtype=np.float64)
+            std_dev = float(closing_arr.std(ddof=1))
+            mean = float(closing_arr.mean())
+            indicators["balance_std_dev"] = round(std_dev, 2)
+            indicators["balance_cv"] = round(std_dev / mean * 100, 1) if mean > 0 else 0
         else:
             indicators["balance_std_dev"] = 0
             indicators["balance_cv"] = 0
 
         # Score
-        score = 50
-        coverage = indicators["revenue_coverage_ratio"]
-        if coverage >= 1.0:
-            score += 10
-        if coverage >= 0.8:
-            score += 5
-        if balance_change > 0:
-            score += 10
-        if runway >= 1.0:
-            score += 10
-        elif runway >= 0.5:
-            score += 5
-        if coverage < 0.5:
-            score -= 15
-        if balance_change < -first_opening * 0.3:
-            score -= 10
-        if runway < 0.2:
-            score -= 10
-
-        score = max(0, min(100, score))
+        score = _health_score({
+            "coverage": indicators["revenue_coverage_ratio"],
+            "balance_change": balance_change,
+            "balance_change_past_floor": balance_change + first_opening * 0.3,
+            "runway": runway,
+        }, GROUP_HEALTH_RULES)
 
         if score >= 80:
             assessment = "Strong — healthy cash flows across the analysis period"
@@ -447,54 +852,18 @@ class InsightsAgent(BaseAgent):
 
     def _generate_group_narrative(self, data: dict) -> dict:
         """Generate LLM narrative for group-level insights."""
-        prompt = f"""You are a senior financial analyst reviewing MULTIPLE bank statements for the same customer.
-Generate a comprehensive narrative analysis covering the full period.
-
-**Account**: {data['account_holder']} at {data['bank']}
-**Period**: {data['period']}
-**Total Statements**: {data['total_statements']}
-**Total Transactions**: {data['total_transactions']}
-**Opening Balance (first statement)**: {(data['opening_balance'] or 0):,.2f}
-**Closing Balance (last statement)**: {(data['closing_balance'] or 0):,.2f}
-
-**Category Breakdown (Top Debits)**:
-{json.dumps(data['category_breakdown']['debit_categories'][:5], indent=2)}
-
-**Top Vendors**:
-{json.dumps(data['top_counterparties']['top_vendors'][:8], indent=2)}
-
-**Cash Flow**:
-- Total Inflow: {(data['cash_flow'].get('total_inflow') or 0):,.2f}
-- Total Outflow: {(data['cash_flow'].get('total_outflow') or 0):,.2f}
-- Net Flow: {(data['cash_flow'].get('net_flow') or 0):,.2f}
-
-**Monthly Trends**:
-{json.dumps(data.get('monthly_trends', {}).get('monthly_flow', []), indent=2)}
-
-**Business Health Score**: {data['business_health']['score']}/100 — {data['business_health']['assessment']}
-
-Return a JSON object with these keys:
-{{
-  "executive_summary": "3-4 sentence high-level summary covering the full period",
-  "spending_analysis": "3-4 sentences on spending patterns and trends across months",
-  "income_analysis": "2-3 sentences on income stability and sources",
-  "cash_flow_assessment": "3-4 sentences on cash flow trajectory and sustainability",
-  "trend_analysis": "2-3 sentences on month-over-month trends and patterns",
-  "risk_observations": "2-3 sentences on concerning patterns across statements",
-  "recommendations": ["recommendation 1", "recommendation 2", "recommendation 3", "recommendation 4"]
-}}
-"""
+        prompt = _GROUP_NARRATIVE_PROMPT.format_map({
+            **_narrative_fields(data),
+            "total_statements": data["total_statements"],
+            "monthly_flow": _fmt_rows(
+                data.get("monthly_trends", {}).get("monthly_flow", []), _MONTH_COLS
+            ),
+            "statement_summaries": "\n".join(
+                f"- {period}: {summary}" for period, summary in data["statement_summaries"]
+            ) or "(none)",
+        })
         try:
-            response = chat_completion(
-                messages=[
-                    {"role": "system", "content": "You are a senior financial analyst. Return ONLY valid JSON."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3,
-                max_tokens=2500,
-                response_format={"type": "json_object"},
-            )
-            return json.loads(response)
+            return _narrative_json(prompt, 2500)
         except Exception as e:
             logger.error(f"Group LLM narrative failed: {e}")
             return {
@@ -504,6 +873,7 @@ Return a JSON object with these keys:
                 "cash_flow_assessment": "",
                 "trend_analysis": "",
                 "risk_observations": "",
+                "risk_rationale": "",
                 "recommendations": [],
             }
 
@@ -511,45 +881,10 @@ Return a JSON object with these keys:
     #  Insight Generators
     # ═══════════════════════════════════════════════════════════════════════════
 
-    def _category_analysis(self, transactions: List[RawTransaction]) -> dict:
+    def _category_analysis(self, agg: TxnAggregates) -> dict:
         """Break down spending and income by category."""
-        debit_by_cat = defaultdict(lambda: {"count": 0, "total": 0.0})
-        credit_by_cat = defaultdict(lambda: {"count": 0, "total": 0.0})
-
-        for t in transactions:
-            cat = t.category or "other"
-            if t.transaction_type == "debit":
-                debit_by_cat[cat]["count"] += 1
-                debit_by_cat[cat]["total"] += t.amount or 0
-            elif t.transaction_type == "credit":
-                credit_by_cat[cat]["count"] += 1
-                credit_by_cat[cat]["total"] += t.amount or 0
-
-        # Format debit categories sorted by total
-        debit_categories = []
-        total_debits = sum(d["total"] for d in debit_by_cat.values())
-        for cat, data in sorted(debit_by_cat.items(), key=lambda x: x[1]["total"], reverse=True):
-            pct = (data["total"] / total_debits * 100) if total_debits > 0 else 0
-            debit_categories.append({
-                "category": cat,
-                "label": CATEGORY_LABELS.get(cat, cat.title()),
-                "count": data["count"],
-                "total": round(data["total"], 2),
-                "percentage": round(pct, 1),
-            })
-
-        # Format credit categories sorted by total
-        credit_categories = []
-        total_credits = sum(d["total"] for d in credit_by_cat.values())
-        for cat, data in sorted(credit_by_cat.items(), key=lambda x: x[1]["total"], reverse=True):
-            pct = (data["total"] / total_credits * 100) if total_credits > 0 else 0
-            credit_categories.append({
-                "category": cat,
-                "label": CATEGORY_LABELS.get(cat, cat.title()),
-                "count": data["count"],
-                "total": round(data["total"], 2),
-                "percentage": round(pct, 1),
-            })
+        debit_categories, total_debits = self._category_rows(agg, agg.is_debit)
+        credit_categories, total_credits = self._category_rows(agg, agg.is_credit)
 
         top_debit_cat = debit_categories[0]["label"] if debit_categories else "N/A"
         top_credit_cat = credit_categories[0]["label"] if credit_categories else "N/A"
@@ -565,67 +900,85 @@ Return a JSON object with these keys:
             "credit_category_count": len(credit_categories),
         }
 
-    def _cash_flow_analysis(self, transactions: List[RawTransaction], metrics: Optional[StatementMetrics]) -> dict:
-        """Analyze cash flow by day of month."""
-        daily_inflow = defaultdict(float)
-        daily_outflow = defaultdict(float)
-        daily_net = defaultdict(float)
-
-        for t in transactions:
-            day = _parse_day(t.date)
-            if day is None:
-                continue
-            if t.transaction_type == "credit":
-                daily_inflow[day] += t.amount or 0
-                daily_net[day] += t.amount or 0
-            elif t.transaction_type == "debit":
-                daily_outflow[day] += t.amount or 0
-                daily_net[day] -= t.amount or 0
-
-        all_days = sorted(set(list(daily_inflow.keys()) + list(daily_outflow.keys())))
-        daily_flow = []
-        for day in all_days:
-            daily_flow.append({
-                "day": day,
-                "inflow": round(daily_inflow.get(day, 0), 2),
-                "outflow": round(daily_outflow.get(day, 0), 2),
-                "net": round(daily_net.get(day, 0), 2),
+    def _category_rows(self, agg: TxnAggregates, mask: np.ndarray) -> tuple[list, float]:
+        """Per-category count/total for the masked rows, sorted by total."""
+        codes = agg.cat_codes[mask]
+        n_cats = len(agg.categories)
+        counts = np.bincount(codes, minlength=n_cats)
+        totals = np.bincount(codes, weights=agg.amounts[mask], minlength=n_cats)
+
+        # Ties keep first-appearance order, as the old dict accumulation did
+        present, first_seen = np.unique(codes, return_index=True)
+        order = present[np.lexsort((first_seen, -totals[present]))]
+
+        grand_total = float(totals.sum())
+        totals = totals[order]
+        pcts = np.round(totals / grand_total * 100, 1).tolist() if grand_total > 0 else [0] * order.size
+        rows = []
+        for code, count, total, pct in zip(
+            order.tolist(), counts[order].tolist(), np.round(totals, 2).tolist(), pcts
+        ):
+            rows.append({
+                "category": agg.categories[code],
+                "label": agg.category_labels[code],
+                "count": count,
+                "total": total,
+                "percentage": pct,
             })
+        return rows, grand_total
 
-        total_inflow = sum(daily_inflow.values())
-        total_outflow = sum(daily_outflow.values())
+    def _cash_flow_analysis(self, agg: TxnAggregates, metrics: Optional[StatementMetrics]) -> dict:
+        """Analyze cash flow by day of month."""
+        is_credit = agg.is_credit
+        flow = (agg.days >= 0) & (is_credit | agg.is_debit)
+        all_days, day_idx = np.unique(agg.days[flow], return_inverse=True)
+        n_days = all_days.size
+        amounts = agg.amounts[flow]
+        credit = is_credit[flow]
+
+        daily_inflow = np.bincount(day_idx, weights=np.where(credit, amounts, 0.0), minlength=n_days)
+        daily_outflow = np.bincount(day_idx, weights=np.where(credit, 0.0, amounts), minlength=n_days)
+        daily_net = daily_inflow - daily_outflow
+
+        daily_flow = [
+            {"day": day, "inflow": inflow, "outflow": outflow, "net": net}
+            for day, inflow, outflow, net in zip(
+                all_days.tolist(),
+                np.round(daily_inflow, 2).tolist(),
+                np.round(daily_outflow, 2).tolist(),
+                np.round(daily_net, 2).tolist(),
+            )
+        ]
+
+        total_inflow = float(daily_inflow.sum())
+        total_outflow = float(daily_outflow.sum())
         net_flow = total_inflow - total_outflow
 
-        # Find peak inflow / outflow days
-        peak_inflow_day = max(daily_inflow, key=daily_inflow.get) if daily_inflow else None
-        peak_outflow_day = max(daily_outflow, key=daily_outflow.get) if daily_outflow else None
+        # Find peak inflow / outflow days (only among days that saw that flow)
+        # Ties go to the day seen first, as max() over the first-seen-ordered
+        # day totals did.
+        def _peak(values: np.ndarray, has_flow: np.ndarray) -> Optional[int]:
+            present, first = np.unique(day_idx[has_flow], return_index=True)
+            present = present[np.argsort(first, kind="stable")]
+            return int(all_days[present[np.argmax(values[present])]]) if present.size else None
+
+        peak_inflow_day = _peak(daily_inflow, credit)
+        peak_outflow_day = _peak(daily_outflow, ~credit)
 
         # Week breakdown (1-7, 8-14, 15-21, 22-31)
-        week_flows = {
-            "week_1 (1-7)": {"inflow": 0, "outflow": 0},
-            "week_2 (8-14)": {"inflow": 0, "outflow": 0},
-            "week_3 (15-21)": {"inflow": 0, "outflow": 0},
-            "week_4 (22-31)": {"inflow": 0, "outflow": 0},
-        }
-        for day in all_days:
-            if day <= 7:
-                key = "week_1 (1-7)"
-            elif day <= 14:
-                key = "week_2 (8-14)"
-            elif day <= 21:
-                key = "week_3 (15-21)"
-            else:
-                key = "week_4 (22-31)"
-            week_flows[key]["inflow"] += daily_inflow.get(day, 0)
-            week_flows[key]["outflow"] += daily_outflow.get(day, 0)
+        week_idx = np.clip((all_days - 1) // 7, 0, 3)          # day 0 → week 1, 29+ → week 4
+        week_inflow = np.bincount(week_idx, weights=daily_inflow, minlength=4)
+        week_outflow = np.bincount(week_idx, weights=daily_outflow, minlength=4)
 
         weekly_breakdown = []
-        for week, data in week_flows.items():
+        for i, week in enumerate(WEEK_LABELS):
+            inflow = float(week_inflow[i])
+            outflow = float(week_outflow[i])
             weekly_breakdown.append({
                 "week": week,
-                "inflow": round(data["inflow"], 2),
-                "outflow": round(data["outflow"], 2),
-                "net": round(data["inflow"] - data["outflow"], 2),
+                "inflow": round(inflow, 2),
+                "outflow": round(outflow, 2),
+                "net": round(inflow - outflow, 2),
             })
 
         return {
@@ -640,220 +993,242 @@ Return a JSON object with these keys:
             "weekly_breakdown": weekly_breakdown,
         }
 
-    def _counterparty_analysis(self, transactions: List[RawTransaction]) -> dict:
+    def _counterparty_analysis(self, agg: TxnAggregates) -> dict:
         """Identify top senders and receivers."""
-        vendor_totals = defaultdict(lambda: {"count": 0, "total": 0.0})
-        customer_totals = defaultdict(lambda: {"count": 0, "total": 0.0})
-
-        for t in transactions:
-            cp = (t.counterparty or "").strip()
-            if not cp or cp.lower() in ("unknown", "n/a", ""):
-                continue
-            if t.transaction_type == "debit":
-                vendor_totals[cp]["count"] += 1
-                vendor_totals[cp]["total"] += t.amount or 0
-            elif t.transaction_type == "credit":
-                customer_totals[cp]["count"] += 1
-                customer_totals[cp]["total"] += t.amount or 0
-
-        top_vendors = sorted(vendor_totals.items(), key=lambda x: x[1]["total"], reverse=True)[:15]
-        top_customers = sorted(customer_totals.items(), key=lambda x: x[1]["total"], reverse=True)[:15]
+        vendor_count, vendor_total = agg.vendor_count, agg.vendor_total
+        customer_count, customer_total = agg.customer_count, agg.customer_total
+
+        top_vendors = vendor_total.most_common(15)
+        top_customers = customer_total.most_common(15)
 
         # Recurring vendors (appeared more than 3 times)
+        recurring = heapq.nlargest(
+            10, ((name, count) for name, count in vendor_count.items() if count >= 3),
+            key=lambda x: x[1],
+        )
         recurring_vendors = [
-            {"name": name, "count": data["count"], "total": round(data["total"], 2)}
-            for name, data in sorted(vendor_totals.items(), key=lambda x: x[1]["count"], reverse=True)
-            if data["count"] >= 3
-        ][:10]
+            {"name": name, "count": count, "total": total}
+            for (name, count), total in zip(
+                recurring, _round_all([vendor_total[name] for name, _ in recurring])
+            )
+        ]
 
         return {
             "top_vendors": [
-                {"name": name, "count": data["count"], "total": round(data["total"], 2)}
-                for name, data in top_vendors
+                {"name": name, "count": vendor_count[name], "total": total}
+                for (name, _), total in zip(top_vendors, _round_all([t for _, t in top_vendors]))
             ],
             "top_customers": [
-                {"name": name, "count": data["count"], "total": round(data["total"], 2)}
-                for name, data in top_customers
+                {"name": name, "count": customer_count[name], "total": total}
+                for (name, _), total in zip(top_customers, _round_all([t for _, t in top_customers]))
             ],
             "recurring_vendors": recurring_vendors,
-            "unique_vendor_count": len(vendor_totals),
-            "unique_customer_count": len(customer_totals),
+            "unique_vendor_count": len(vendor_count),
+            "unique_customer_count": len(customer_count),
         }
 
     def _unusual_transaction_detection(
-        self, transactions: List[RawTransaction], metrics: Optional[StatementMetrics]
+        self, agg: TxnAggregates, metrics: Optional[StatementMetrics]
     ) -> dict:
         """Detect unusual or noteworthy transactions."""
-        debits = [t for t in transactions if t.transaction_type == "debit" and t.amount]
-        credits = [t for t in transactions if t.transaction_type == "credit" and t.amount]
-
+        amounts = agg.amounts
+        nonzero = amounts != 0
         unusual = []
 
-        # 1. Large transactions (>3x average)
-        if debits:
-            avg_debit = sum(t.amount for t in debits) / len(debits)
-            threshold = avg_debit * 3
-            for t in debits:
-                if t.amount >= threshold:
-                    multiple = t.amount / avg_debit
-                    unusual.append({
-                        "type": "large_debit",
-                        "date": t.date,
-                        "description": t.description,
-                        "amount": t.amount,
-                        "reason": f"Amount ({t.amount:,.2f}) is >3x the average debit ({avg_debit:,.2f})",
-                        "explanation": f"This outgoing payment of {t.amount:,.2f} is {multiple:.1f}x the average "
-                                       f"debit of {avg_debit:,.2f}. Transactions significantly above the account's "
-                                       f"typical spending pattern may indicate bulk payments, one-off capital "
-                                       f"expenditures, or potentially unauthorized large withdrawals.",
-                    })
-
-        if credits:
-            avg_credit = sum(t.amount for t in credits) / len(credits)
-            threshold = avg_credit * 3
-            for t in credits:
-                if t.amount >= threshold:
-                    multiple = t.amount / avg_credit
-                    unusual.append({
-                        "type": "large_credit",
-                        "date": t.date,
-                        "description": t.description,
-                        "amount": t.amount,
-                        "reason": f"Amount ({t.amount:,.2f}) is >3x the average credit ({avg_credit:,.2f})",
-                        "explanation": f"This incoming payment of {t.amount:,.2f} is {multiple:.1f}x the average "
-                                       f"credit of {avg_credit:,.2f}. Unusually large inflows may represent "
-                                       f"one-off settlements, large client payments, loan disbursements, or "
-                                       f"irregular deposits that merit source verification.",
-                    })
+        # 1. Large transactions (>3x average) — debits first, then credits;
+        # only the 20 reported rows are formatted, the rest are just counted.
+        avg_debit, debit_idx = large_indices(
+            amounts, agg.is_debit & nonzero, LARGE_TXN_FACTOR, LARGE_TXN_MIN_SAMPLES
+        )
+        avg_credit, credit_idx = large_indices(
+            amounts, agg.is_credit & nonzero, LARGE_TXN_FACTOR, LARGE_TXN_MIN_SAMPLES
+        )
+        large_count = int(debit_idx.size + credit_idx.size)
+        debit_idx = debit_idx[:20]
+        credit_idx = credit_idx[:20 - debit_idx.size]
+
+        for i in debit_idx:
+            amount = float(amounts[i])
+            multiple = amount / avg_debit
+            unusual.append({
+                "type": "large_debit",
+                "date": agg.dates[i],
+                "description": agg.descriptions[i],
+                "amount": amount,
+                "reason": f"Amount ({amount:,.2f}) is >3x the average debit ({avg_debit:,.2f})",
+                "explanation": f"This outgoing payment of {amount:,.2f} is {multiple:.1f}x the average "
+                               f"debit of {avg_debit:,.2f}. Transactions significantly above the account's "
+                               f"typical spending pattern may indicate bulk payments, one-off capital "
+                               f"expenditures, or potentially unauthorized large withdrawals.",
+            })
+
+        for i in credit_idx:
+            amount = float(amounts[i])
+            multiple = amount / avg_credit
+            unusual.append({
+                "type": "large_credit",
+                "date": agg.dates[i],
+                "description": agg.descriptions[i],
+                "amount": amount,
+                "reason": f"Amount ({amount:,.2f}) is >3x the average credit ({avg_credit:,.2f})",
+                "explanation": f"This incoming payment of {amount:,.2f} is {multiple:.1f}x the average "
+                               f"credit of {avg_credit:,.2f}. Unusually large inflows may represent "
+                               f"one-off settlements, large client payments, loan disbursements, or "
+                               f"irregular deposits that merit source verification.",
+            })
 
         # 2. Round number transactions (exact thousands — could indicate manual transfers)
+        round_mask = (amounts >= 1000) & (np.mod(amounts, 1.0) == 0.0)
         round_txns = []
-        for t in transactions:
-            if t.amount and t.amount >= 1000 and t.amount == int(t.amount):
-                round_txns.append({
-                    "type": "round_number",
-                    "date": t.date,
-                    "description": t.description,
-                    "amount": t.amount,
-                    "transaction_type": t.transaction_type,
-                    "reason": f"Exact round amount of {t.amount:,.0f} — may indicate a manual or structured transfer rather than an organic payment",
-                    "explanation": f"This {t.transaction_type or 'transaction'} of {t.amount:,.2f} is an exact multiple of 1,000. "
-                                   f"Round-number transactions can signal manual transfers, loan repayments, or "
-                                   f"structured deposits that warrant closer review.",
-                })
+        for i in np.flatnonzero(round_mask)[:20]:
+            amount = float(amounts[i])
+            ttype = agg.types[i]
+            round_txns.append({
+                "type": "round_number",
+                "date": agg.dates[i],
+                "description": agg.descriptions[i],
+                "amount": amount,
+                "transaction_type": ttype,
+                "reason": f"Exact round amount of {amount:,.0f} — may indicate a manual or structured transfer rather than an organic payment",
+                "explanation": f"This {ttype or 'transaction'} of {amount:,.2f} is an exact multiple of 1,000. "
+                               f"Round-number transactions can signal manual transfers, loan repayments, or "
+                               f"structured deposits that warrant closer review.",
+            })
 
         # 3. Same-day large movements (both in and out on same day)
-        day_movements = defaultdict(lambda: {"credits": 0.0, "debits": 0.0})
-        for t in transactions:
-            if t.date and t.amount:
-                if t.transaction_type == "credit":
-                    day_movements[t.date]["credits"] += t.amount
-                else:
-                    day_movements[t.date]["debits"] += t.amount
-
+        # Per-date credit/debit totals (non-credit rows count as debits);
+        # flagged dates are listed in order of their first movement.
+        n_dates = len(agg.date_values)
+        has_date = np.array([bool(d) for d in agg.date_values], dtype=bool)
+        moving = np.flatnonzero(nonzero & has_date[agg.date_codes])
+        codes = agg.date_codes[moving]
+        moved = amounts[moving]
+        credit = agg.is_credit[moving]
+        day_credits = np.bincount(codes, weights=np.where(credit, moved, 0.0), minlength=n_dates)
+        day_debits = np.bincount(codes, weights=np.where(credit, 0.0, moved), minlength=n_dates)
+        present, first = np.unique(codes, return_index=True)
+        flagged = (day_credits[present] > 5000) & (day_debits[present] > 5000)
+        flagged_codes = present[flagged][np.argsort(first[flagged])]
+        same_day = [
+            (agg.date_values[code], credits, debits)
+            for code, credits, debits in zip(
+                flagged_codes.tolist(),
+                day_credits[flagged_codes].tolist(),
+                day_debits[flagged_codes].tolist(),
+            )
+        ]
+        flows = np.array([(c, d) for _, c, d in same_day], dtype=np.float64).reshape(-1, 2)
+        same_day_rounded = zip(
+            _round_all(flows[:, 0]), _round_all(flows[:, 1]),
+            _round_all(flows[:, 0] - flows[:, 1]), _round_all(flows.sum(axis=1)),
+        )
         same_day_flags = []
-        for day, mv in day_movements.items():
-            if mv["credits"] > 5000 and mv["debits"] > 5000:
-                net = round(mv["credits"] - mv["debits"], 2)
-                same_day_flags.append({
-                    "type": "same_day_large_movement",
-                    "date": day,
-                    "credits": round(mv["credits"], 2),
-                    "debits": round(mv["debits"], 2),
-                    "amount": round(mv["credits"] + mv["debits"], 2),
-                    "reason": "Both large credits and debits on the same day",
-                    "description": f"Credits: {mv['credits']:,.2f} | Debits: {mv['debits']:,.2f} | Net: {net:,.2f}",
-                    "explanation": f"On {day}, the account received {mv['credits']:,.2f} in credits and "
-                                   f"sent out {mv['debits']:,.2f} in debits (net: {net:,.2f}). "
-                                   f"Same-day large bi-directional flows can indicate pass-through activity, "
-                                   f"money laundering layering, or fund restructuring.",
-                })
-
-        # 4. Low balance alerts
+        for (day, credits, debits), (credits_r, debits_r, net, amount) in zip(same_day, same_day_rounded):
+            same_day_flags.append({
+                "type": "same_day_large_movement",
+                "date": day,
+                "credits": credits_r,
+                "debits": debits_r,
+                "amount": amount,
+                "reason": "Both large credits and debits on the same day",
+                "description": f"Credits: {credits:,.2f} | Debits: {debits:,.2f} | Net: {net:,.2f}",
+                "explanation": f"On {day}, the account received {credits:,.2f} in credits and "
+                               f"sent out {debits:,.2f} in debits (net: {net:,.2f}). "
+                               f"Same-day large bi-directional flows can indicate pass-through activity, "
+                               f"money laundering layering, or fund restructuring.",
+            })
+
+        # 4. Low balance alerts — first row per date with balance < 10k
+        low_idx = np.flatnonzero(agg.balances < 10000)      # NaN → False
+        _, first = np.unique(agg.date_codes[low_idx], return_index=True)
+        low_idx = np.sort(low_idx[first])
         low_balance_events = []
-        seen_dates = set()
-        for t in transactions:
-            if t.balance is not None and t.balance < 10000 and t.date not in seen_dates:
-                low_balance_events.append({
-                    "type": "low_balance",
-                    "date": t.date,
-                    "balance": t.balance,
-                    "amount": t.balance,
-                    "description": t.description,
-                    "reason": f"Account balance dropped to {t.balance:,.2f}",
-                    "explanation": f"After transaction '{(t.description or 'N/A')[:60]}', the account balance "
-                                   f"fell to {t.balance:,.2f}. Low balances may indicate cash flow stress, "
-                                   f"over-commitment, or an impending overdraft.",
-                })
-                seen_dates.add(t.date)
+        for i in low_idx[:10].tolist():
+            date, balance, desc = agg.dates[i], float(agg.balances[i]), agg.descriptions[i]
+            low_balance_events.append({
+                "type": "low_balance",
+                "date": date,
+                "balance": balance,
+                "amount": balance,
+                "description": desc,
+                "reason": f"Account balance dropped to {balance:,.2f}",
+                "explanation": f"After transaction '{(desc or 'N/A')[:60]}', the account balance "
+                               f"fell to {balance:,.2f}. Low balances may indicate cash flow stress, "
+                               f"over-commitment, or an impending overdraft.",
+            })
 
         return {
-            "large_transactions": unusual[:20],
-            "round_number_transactions": round_txns[:20],
+            "large_transactions": unusual,
+            "round_number_transactions": round_txns,
             "same_day_large_movements": same_day_flags,
-            "low_balance_events": low_balance_events[:10],
-            "total_flags": len(unusual) + len(same_day_flags) + len(low_balance_events),
+            "low_balance_events": low_balance_events,
+            "total_flags": large_count + len(same_day_flags) + int(low_idx.size),
         }
 
-    def _day_of_month_patterns(self, transactions: List[RawTransaction]) -> dict:
+    def _day_of_month_patterns(self, agg: TxnAggregates) -> dict:
         """Analyze transaction density by day of month."""
-        day_counts = Counter()
-        day_amounts = defaultdict(float)
-
-        for t in transactions:
-            day = _parse_day(t.date)
-            if day:
-                day_counts[day] += 1
-                day_amounts[day] += t.amount or 0
-
-        pattern = []
-        for day in sorted(set(day_counts.keys())):
-            pattern.append({
-                "day": day,
-                "transaction_count": day_counts[day],
-                "total_amount": round(day_amounts[day], 2),
-            })
+        valid = np.flatnonzero(agg.days > 0)
+        days, first, inv = np.unique(agg.days[valid], return_index=True, return_inverse=True)
+        day_counts = np.bincount(inv, minlength=days.size)
+        day_amounts = np.bincount(inv, weights=agg.amounts[valid], minlength=days.size)
+
+        pattern = [
+            {"day": day, "transaction_count": count, "total_amount": total}
+            for day, count, total in zip(
+                days.tolist(), day_counts.tolist(), np.round(day_amounts, 2).tolist()
+            )
+        ]
 
-        busiest_day = max(day_counts, key=day_counts.get) if day_counts else None
-        quietest_day = min(day_counts, key=day_counts.get) if day_counts else None
-        highest_value_day = max(day_amounts, key=day_amounts.get) if day_amounts else None
+        # Ties go to the day seen first in the statement
+        busiest_day = quietest_day = highest_value_day = None
+        if days.size:
+            order = np.argsort(first)
+            days, day_counts, day_amounts = days[order], day_counts[order], day_amounts[order]
+            busiest_day = int(days[np.argmax(day_counts)])
+            quietest_day = int(days[np.argmin(day_counts)])
+            highest_value_day = int(days[np.argmax(day_amounts)])
 
         return {
             "daily_pattern": pattern,
             "busiest_day": busiest_day,
             "quietest_day": quietest_day,
             "highest_value_day": highest_value_day,
-            "active_days": len(day_counts),
+            "active_days": agg.active_days,
         }
 
-    def _channel_analysis(self, transactions: List[RawTransaction]) -> dict:
+    def _channel_analysis(self, agg: TxnAggregates) -> dict:
         """Break down transactions by payment channel."""
-        channel_data = defaultdict(lambda: {"count": 0, "total": 0.0})
-
-        for t in transactions:
-            ch = (t.channel or "Unknown").strip()
-            channel_data[ch]["count"] += 1
-            channel_data[ch]["total"] += t.amount or 0
-
-        channels = sorted(channel_data.items(), key=lambda x: x[1]["total"], reverse=True)
-        total_amount = sum(d["total"] for _, d in channels)
+        n_channels = len(agg.channels)
+        counts = np.bincount(agg.channel_codes, minlength=n_channels)
+        totals = np.bincount(agg.channel_codes, weights=agg.amounts, minlength=n_channels)
+
+        # Highest total first; ties keep first-appearance order
+        order = np.argsort(-totals, kind="stable")
+        channels = [agg.channels[code] for code in order.tolist()]
+        totals = totals[order]
+        total_amount = totals.sum()
+        pcts = (
+            _round_all(totals / total_amount * 100, 1) if total_amount > 0 else [0] * n_channels
+        )
 
         return {
             "channels": [
                 {
                     "channel": name,
-                    "count": data["count"],
-                    "total": round(data["total"], 2),
-                    "percentage": round(data["total"] / total_amount * 100, 1) if total_amount > 0 else 0,
+                    "count": count,
+                    "total": total,
+                    "percentage": pct,
                 }
-                for name, data in channels
+                for name, count, total, pct in zip(
+                    channels, counts[order].tolist(), _round_all(totals), pcts
+                )
             ],
-            "dominant_channel": channels[0][0] if channels else "N/A",
+            "dominant_channel": channels[0] if channels else "N/A",
             "total_channels": len(channels),
         }
 
     def _business_health_indicators(
-        self, transactions: List[RawTransaction], metrics: Optional[StatementMetrics]
+        self, agg: TxnAggregates, metrics: Optional[StatementMetrics]
     ) -> dict:
         """Compute business health score and indicators."""
         indicators = {}
@@ -894,8 +1269,8 @@ Return a JSON object with these keys:
         indicators["total_fees"] = round(fees, 2)
 
         # 6. Transaction velocity (transactions per active day)
-        days_active = len(set(_parse_day(t.date) for t in transactions if _parse_day(t.date)))
-        velocity = len(transactions) / days_active if days_active > 0 else 0
+        days_active = agg.active_days
+        velocity = agg.n / days_active if days_active > 0 else 0
         indicators["daily_transaction_velocity"] = round(velocity, 1)
         indicators["active_days"] = days_active
 
@@ -906,35 +1281,15 @@ Return a JSON object with these keys:
         indicators["min_balance_cover_days"] = round(min_balance_cover_days, 1)
 
         # ── Compute composite score (0-100) ──────────────────────────────
-        score = 50  # start at neutral
-
-        # Positive signals
-        if coverage >= 1.0:
-            score += 10
-        if coverage >= 0.8:
-            score += 5
-        if closing >= opening:
-            score += 10
-        if runway_months >= 0.5:
-            score += 5
-        if runway_months >= 1.0:
-            score += 5
-        if min_balance_cover_days >= 3:
-            score += 5
-
-        # Negative signals
-        if coverage < 0.5:
-            score -= 15
-        if closing < opening * 0.5:
-            score -= 10
-        if min_bal < 5000:
-            score -= 10
-        if cash_ratio > 30:
-            score -= 5
-        if runway_months < 0.1:
-            score -= 10
-
-        score = max(0, min(100, score))
+        score = _health_score({
+            "coverage": coverage,
+            "balance_change": balance_change,
+            "closing_less_half_opening": closing - opening * 0.5,
+            "runway": runway_months,
+            "min_balance_cover_days": min_balance_cover_days,
+            "min_balance": min_bal,
+            "cash_ratio": cash_ratio,
+        }, HEALTH_RULES)
 
         if score >= 80:
             assessment = "Strong — healthy cash flows with positive trajectory"
@@ -957,69 +1312,18 @@ Return a JSON object with these keys:
 
     def _generate_llm_narrative(self, data: dict) -> dict:
         """Use Azure OpenAI to generate a human-readable narrative summary."""
-        prompt = f"""You are a senior financial analyst reviewing a business bank statement.
-Generate a concise but insightful narrative analysis based on the data below.
-
-**Account**: {data['account_holder']} at {data['bank']}
-**Period**: {data['period']}
-**Opening Balance**: {(data['opening_balance'] or 0):,.2f}
-**Closing Balance**: {(data['closing_balance'] or 0):,.2f}
-**Total Transactions**: {data['total_transactions']}
-
-**Category Breakdown (Top Debits)**:
-{json.dumps(data['category_breakdown']['debit_categories'][:5], indent=2)}
-
-**Top Vendors**:
-{json.dumps(data['top_counterparties']['top_vendors'][:8], indent=2)}
-
-**Top Customers/Senders**:
-{json.dumps(data['top_counterparties']['top_customers'][:5], indent=2)}
-
-**Cash Flow**:
-- Total Inflow: {(data['cash_flow'].get('total_inflow') or 0):,.2f}
-- Total Outflow: {(data['cash_flow'].get('total_outflow') or 0):,.2f}
-- Net Flow: {(data['cash_flow'].get('net_flow') or 0):,.2f}
-- Peak Inflow Day: {data['cash_flow'].get('peak_inflow_day')}
-- Peak Outflow Day: {data['cash_flow'].get('peak_outflow_day')}
-
-**Business Health Score**: {data['business_health']['score']}/100 — {data['business_health']['assessment']}
-**Key Indicators**: {json.dumps(data['business_health']['indicators'], indent=2)}
-
-**Unusual Transactions**: {data['unusual_transactions']['total_flags']} flags detected
-- Large transactions: {len(data['unusual_transactions']['large_transactions'])}
-- Same-day large movements: {len(data['unusual_transactions']['same_day_large_movements'])}
-- Low balance events: {len(data['unusual_transactions']['low_balance_events'])}
-
-Return a JSON object with these keys:
-{{
-  "executive_summary": "2-3 sentence high-level summary",
-  "spending_analysis": "3-4 sentences on spending patterns and major expense categories",
-  "income_analysis": "2-3 sentences on income sources and patterns",
-  "cash_flow_assessment": "2-3 sentences on cash flow health, burn rate, and trajectory",
-  "risk_observations": "2-3 sentences on any concerning patterns or red flags",
-  "recommendations": ["recommendation 1", "recommendation 2", "recommendation 3"]
-}}
-"""
+        prompt = _NARRATIVE_PROMPT.format_map(_narrative_fields(data))
         try:
-            response = chat_completion(
-                messages=[
-                    {"role": "system", "content": "You are a senior financial analyst. Return ONLY valid JSON."},
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3,
-                max_tokens=2000,
-                response_format={"type": "json_object"},
-            )
-            narrative = json.loads(response)
-            return narrative
+            return _narrative_json(prompt, 2000)
         except Exception as e:
             logger.error(f"LLM narrative generation failed: {e}")
             return {
-                "executive_summary": "Narrative generation failed — see structured data for insights.",
+                "executive_summary": NARRATIVE_FAILED,
                 "spending_analysis": "",
                 "income_analysis": "",
                 "cash_flow_assessment": "",
                 "risk_observations": "",
+                "risk_rationale": "",
                 "recommendations": [],
             }
 
@@ -1032,14 +1336,10 @@ Return a JSON object with these keys:
         score = data["business_health"]["score"]
         flags = data["unusual_transactions"]["total_flags"]
 
-        if score >= 70 and flags < 5:
-            return "low"
-        elif score >= 50 and flags < 15:
-            return "medium"
-        elif score >= 30:
-            return "high"
-        else:
-            return "critical"
+        for min_score, max_flags, level in RISK_TIERS:
+            if score >= min_score and flags < max_flags:
+                return level
+        return "critical"
 
     def _error(self, message: str) -> dict:
         return {
@@ -15,19 +15,21 @@ Output: Layout context that guides extraction for better accuracy.
 """
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
 import logging
 import math
 import re
-from typing import Dict, List, Optional, Tuple
-from collections import Counter
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import Counter, OrderedDict
 
-import pdfplumber
 from sqlalchemy.orm import Session
 
 from agents.base import BaseAgent
 from models import Document
-from services.pdf_processor import extract_text_with_pdfplumber
+from services.pdf_processor import extract_text_with_pymupdf
 
 logger = logging.getLogger("ThirdEye.Agent.Layout")
 
@@ -38,6 +40,45 @@ def sanitize_float(value: float) -> float:
         return 0.0
     return value
 
+def _in_any(needle: str, texts: List[str]) -> bool:
+    """``needle in text`` for any page text — scans the pages in place
+    instead of joining them into one more copy of the document."""
+    return any(needle in text for text in texts)
+
+def _looks_like_date_prefix(cell: str) -> bool:
+    r"""``re.match(r'\d{1,2}[\-/\s]', cell)`` as plain character tests —
+    one or two digits followed by '-', '/' or whitespace."""
+    if len(cell) < 2 or not cell[0].isdecimal():
+        return False
+    sep = cell[1]
+    if sep.isdecimal():
+        if len(cell) < 3:
+            return False
+        sep = cell[2]
+    return sep in "-/" or sep.isspace()
+
+
+class _PageTables:
+    """Read-only sequence of each page's ``extract_tables()`` result.
+
+    pdfplumber re-parses the page content stream on every call, so each
+    page is extracted once, on first access — helpers that stop early
+    never pay for the pages they skip.  Any plain list of per-page tables
+    can stand in for it.
+    """
+
+    def __init__(self, pages: List):
+        self._pages = pages
+        self._tables: Dict[int, List] = {}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def __getitem__(self, idx: int) -> List:
+        if idx not in self._tables:
+            self._tables[idx] = self._pages[idx].extract_tables()
+        return self._tables[idx]
+
 # ─── Bank Detection Patterns ──────────────────────────────────────────────────
 
 BANK_SIGNATURES = {
@@ -99,6 +140,17 @@ BANK_SIGNATURES = {
 }
 
 
+# ─── Balance Marker Phrases ───────────────────────────────────────────────────
+
+# Most specific phrase first — "B/F" alone also appears inside "BALANCE B/F"
+BALANCE_MARKERS = {
+    "opening_balance": ("BALANCE B/F", "BALANCE BROUGHT FORWARD", "OPENING BALANCE",
+                        "BROUGHT FORWARD", "B/F"),
+    "closing_balance": ("BALANCE C/F", "BALANCE CARRIED FORWARD", "CLOSING BALANCE",
+                        "CARRIED FORWARD", "C/F"),
+}
+
+
 # ─── Column Header Mappings ───────────────────────────────────────────────────
 
 COLUMN_ALIASES = {
@@ -112,6 +164,22 @@ COLUMN_ALIASES = {
 }
 
 
+# Canonical names in matching priority order
+_CANONICAL_RANK = {canonical: rank for rank, canonical in enumerate(COLUMN_ALIASES)}
+
+
+@functools.lru_cache(maxsize=512)
+def _header_canonical(header_clean: str) -> Optional[str]:
+    """First canonical (in COLUMN_ALIASES order) with an alias that contains,
+    or is contained in, the cleaned header.  Cached — headers repeat across
+    pages and statements, so each distinct header is scanned once."""
+    for canonical, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header_clean or header_clean in alias:
+                return canonical
+    return None
+
+
 # ─── Date Format Detection ────────────────────────────────────────────────────
 
 DATE_PATTERNS = [
@@ -124,6 +192,23 @@ DATE_PATTERNS = [
 ]
 
 
+# ─── Compiled patterns (built once at import) ─────────────────────────────────
+
+# bank → (upper-cased keywords, upper-cased products, compiled header patterns)
+_BANK_MATCHERS = {
+    bank: (
+        tuple(k.upper() for k in sig["keywords"]),
+        tuple(p.upper() for p in sig["products"]),
+        tuple(re.compile(p) for p in sig["header_patterns"]),
+    )
+    for bank, sig in BANK_SIGNATURES.items()
+}
+_DATE_RES = [(re.compile(p), name) for p, name in DATE_PATTERNS]
+_DECIMAL_COMMA_RE = re.compile(r'\d{1,3},\d{3}\.\d{2}')    # 1,234.56
+_EUROPEAN_RE = re.compile(r'\d{1,3}\.\d{3},\d{2}')         # 1.234,56
+_CURRENCY_SUFFIX_RE = re.compile(r'\s*\([A-Z]{3}\)\s*')    # (SGD)
+
+
 class LayoutAgent(BaseAgent):
     """Analyzes PDF layout and structure to improve extraction accuracy."""
 
@@ -165,6 +250,11 @@ class LayoutAgent(BaseAgent):
             return self._error(f"Layout analysis failed: {str(e)}")
 
     def _analyze_layout(self, file_path: str) -> dict:
+        """Layout context for the file — reused when the same PDF content is
+        analysed again (agent retries, pipeline re-runs)."""
+        return json.loads(_cached_layout(_file_digest(file_path), file_path))
+
+    def _analyze_pdf(self, file_path: str) -> dict:
         """Main layout analysis logic."""
         context = {
             "bank_detected": "Unknown",
@@ -180,61 +270,85 @@ class LayoutAgent(BaseAgent):
             "has_tables": False,
         }
 
+        # pdfplumber drags in pdfminer.six and Pillow; load it on first use
+        # rather than whenever the agents package is imported.
+        import pdfplumber
+
         with pdfplumber.open(file_path) as pdf:
             context["page_count"] = len(pdf.pages)
             
             # Analyze first 3 pages (sufficient for layout detection)
             first_pages = pdf.pages[:min(3, len(pdf.pages))]
+
+            # Text-only steps read PyMuPDF text (an order of magnitude faster
+            # than pdfplumber's); pdfplumber is kept for table geometry.
+            # The last pages are read too: closing-balance markers sit there.
+            page_count = len(pdf.pages)
+            head = list(range(len(first_pages)))
+            tail = list(range(max(len(head), page_count - 2), page_count))
+            texts = [page["text"] for page in extract_text_with_pymupdf(file_path, head + tail)]
+            page_texts = texts[:len(head)]
+            upper_texts = [text.upper() for text in texts]
             
             # Step 1: Bank detection
-            bank_info = self._detect_bank(first_pages)
+            bank_info = self._detect_bank(upper_texts[:len(head)])
             context["bank_detected"] = bank_info["bank"]
             context["confidence"] = sanitize_float(bank_info["confidence"])
             
+            # Image-only pages (same rule as pdf_processor.is_scanned_pdf):
+            # no text layer means no tables for pdfplumber to find.
+            context["is_scanned"] = all(len(text.strip()) <= 20 for text in page_texts)
+
+            # Tables are extracted at most once per page, and only for the
+            # pages a helper actually visits.
+            page_tables = _PageTables([] if context["is_scanned"] else first_pages)
+
             # Step 2: Table structure analysis
-            table_info = self._analyze_tables(first_pages)
+            table_info = self._analyze_tables(page_tables)
             context["table_structure"] = table_info["structure"]
             context["has_tables"] = table_info["has_tables"]
             context["column_mapping"] = table_info["column_mapping"]
             
             # Step 3: Date/amount format detection
-            format_info = self._detect_formats(first_pages)
+            format_info = self._detect_formats(page_texts)
             context["date_format"] = format_info["date_format"]
             context["amount_format"] = format_info["amount_format"]
             
             # Step 4: Special markers detection
-            context["special_markers"] = self._detect_special_markers(first_pages)
+            context["special_markers"] = self._detect_special_markers(upper_texts)
             
             # Step 5: Multi-line description detection
             context["multi_line_descriptions"] = self._detect_multiline_descriptions(
-                first_pages, table_info
+                page_tables, table_info
             )
 
         return context
 
-    def _detect_bank(self, pages: List) -> dict:
-        """Detect bank from text patterns, keywords, and products."""
-        all_text = "\n".join(page.extract_text() or "" for page in pages[:2])
-        all_text_upper = all_text.upper()
+    def _detect_bank(self, upper_texts: List[str]) -> dict:
+        """Detect bank from text patterns, keywords, and products.
+
+        ``upper_texts`` are the upper-cased texts of the first pages.
+        """
+        texts = upper_texts[:2]
         
         scores = {}
         
-        for bank_name, signatures in BANK_SIGNATURES.items():
+        for bank_name, (keywords, products, header_res) in _BANK_MATCHERS.items():
             score = 0
             
             # Check keywords
-            for keyword in signatures["keywords"]:
-                if keyword.upper() in all_text_upper:
+            for keyword in keywords:
+                if _in_any(keyword, texts):
                     score += 3
             
             # Check product names
-            for product in signatures["products"]:
-                if product.upper() in all_text_upper:
+            for product in products:
+                if _in_any(product, texts):
                     score += 2
             
             # Check header patterns
-            for pattern in signatures["header_patterns"]:
-                if re.search(pattern, all_text_upper):
+            for pattern in header_res:
+                if any(pattern.search(text) for text in texts):
                     score += 2
             
             if score > 0:
@@ -252,8 +366,11 @@ class LayoutAgent(BaseAgent):
         
         return {"bank": detected_bank, "confidence": sanitize_float(confidence)}
 
-    def _analyze_tables(self, pages: List) -> dict:
-        """Analyze table structures and column headers."""
+    def _analyze_tables(self, page_tables: Sequence[List]) -> dict:
+        """Analyze table structures and column headers.
+
+        ``page_tables[i]`` holds the extracted tables of page ``i``.
+        """
         result = {
             "has_tables": False,
             "structure": None,
@@ -261,8 +378,8 @@ class LayoutAgent(BaseAgent):
         }
         
         # Look for tables in first few pages
-        for page_idx, page in enumerate(pages[:3]):
-            tables = page.extract_tables()
+        for page_idx in range(min(3, len(page_tables))):
+            tables = page_tables[page_idx]
             
             if not tables:
                 continue
@@ -300,44 +417,43 @@ class LayoutAgent(BaseAgent):
     def _map_columns(self, headers: List[str]) -> dict:
         """Map table headers to canonical column names."""
         mapping = {}
+        first_rank = len(COLUMN_ALIASES)      # best-ranked canonical mapped so far
         
         for idx, header in enumerate(headers):
             if not header:
                 continue
             
-            header_clean = header.strip().lower()
-            # Remove non-ASCII characters
-            header_clean = re.sub(r'[^\x00-\x7f]', '', header_clean)
+            # Lower-case and drop non-ASCII characters in one C-level pass
+            header_clean = header.strip().lower().encode("ascii", "ignore").decode()
             # Remove currency markers like (SGD)
-            header_clean = re.sub(r'\s*\([A-Z]{3}\)\s*', '', header_clean)
+            if "(" in header_clean:
+                header_clean = _CURRENCY_SUFFIX_RE.sub('', header_clean)
             header_clean = header_clean.strip()
             
-            # Try to match to canonical name
-            for canonical, aliases in COLUMN_ALIASES.items():
-                for alias in aliases:
-                    if alias in header_clean or header_clean in alias:
-                        mapping[canonical] = idx
-                        break
-                if canonical in mapping:
-                    break
+            # The canonical scan stops at the first canonical already mapped,
+            # so a header only claims a canonical ranked at or above it.
+            canonical = _header_canonical(header_clean)
+            if canonical is not None and _CANONICAL_RANK[canonical] <= first_rank:
+                mapping[canonical] = idx
+                first_rank = _CANONICAL_RANK[canonical]
         
         return mapping
 
-    def _detect_formats(self, pages: List) -> dict:
+    def _detect_formats(self, page_texts: List[str]) -> dict:
         """Detect date and amount formats from sample text."""
-        text = "\n".join(page.extract_text() or "" for page in pages[:2])
+        text = "\n".join(page_texts[:2])
         
         # Date format detection
         date_format = "DD MMM"  # default
-        for pattern, format_name in DATE_PATTERNS:
-            if re.search(pattern, text):
+        for pattern, format_name in _DATE_RES:
+            if pattern.search(text):
                 date_format = format_name
                 break
         
         # Amount format detection (comma vs period)
         # Look for patterns like 1,234.56 (decimal) or 1.234,56 (european)
-        decimal_count = len(re.findall(r'\d{1,3},\d{3}\.\d{2}', text))
-        european_count = len(re.findall(r'\d{1,3}\.\d{3},\d{2}', text))
+        decimal_count = len(_DECIMAL_COMMA_RE.findall(text))
+        european_count = len(_EUROPEAN_RE.findall(text))
         
         amount_format = "decimal_comma" if decimal_count >= european_count else "european"
         
@@ -346,32 +462,23 @@ class LayoutAgent(BaseAgent):
             "amount_format": amount_format,
         }
 
-    def _detect_special_markers(self, pages: List) -> dict:
-        """Detect special transaction markers (opening/closing balance, etc.)."""
-        text = "\n".join(page.extract_text() or "" for page in pages)
-        text_upper = text.upper()
-        
+    def _detect_special_markers(self, upper_texts: List[str]) -> dict:
+        """Detect special transaction markers (opening/closing balance, etc.).
+
+        ``upper_texts`` cover the first and last pages only — brought/carried
+        forward lines sit at the statement's boundaries, not mid-document.
+        """
         markers = {}
-        
-        # Opening balance markers
-        ob_patterns = ["BALANCE B/F", "BALANCE BROUGHT FORWARD", "OPENING BALANCE", 
-                       "BROUGHT FORWARD", "B/F"]
-        for pattern in ob_patterns:
-            if pattern in text_upper:
-                markers["opening_balance"] = pattern
-                break
-        
-        # Closing balance markers
-        cb_patterns = ["BALANCE C/F", "BALANCE CARRIED FORWARD", "CLOSING BALANCE",
-                       "CARRIED FORWARD", "C/F"]
-        for pattern in cb_patterns:
-            if pattern in text_upper:
-                markers["closing_balance"] = pattern
-                break
+        for kind, patterns in BALANCE_MARKERS.items():
+            # First (most specific) phrase present wins
+            for pattern in patterns:
+                if _in_any(pattern, upper_texts):
+                    markers[kind] = pattern
+                    break
         
         return markers
 
-    def _detect_multiline_descriptions(self, pages: List, table_info: dict) -> bool:
+    def _detect_multiline_descriptions(self, page_tables: Sequence[List], table_info: dict) -> bool:
         """
         Detect if transaction descriptions span multiple lines.
         Common in DBS statements.
@@ -380,9 +487,8 @@ class LayoutAgent(BaseAgent):
             return False
         
         # If table structure has many rows but few date entries, likely multi-line
-        for page in pages[:2]:
-            tables = page.extract_tables()
-            for table in tables:
+        for page_idx in range(min(2, len(page_tables))):
+            for table in page_tables[page_idx]:
                 if len(table) < 5:
                     continue
                 
@@ -395,12 +501,15 @@ class LayoutAgent(BaseAgent):
                         continue
                     # Check if first cell looks like a date
                     first_cell = str(row[0] or "").strip()
-                    if re.match(r'\d{1,2}[\-/\s]', first_cell):
+                    if _looks_like_date_prefix(first_cell):
                         date_rows += 1
                 
                 # If less than 60% of rows have dates, likely multi-line
                 if date_rows > 0 and date_rows / total_rows < 0.6:
                     return True
+                # A sizeable table with a date on nearly every row settles it
+                if total_rows >= 10 and date_rows / total_rows >= 0.8:
+                    return False
         
         return False
 
@@ -435,3 +544,38 @@ class LayoutAgent(BaseAgent):
             "summary": f"Layout analysis error: {message}",
             "risk_level": "low",
         }
+
+
+# ─── Layout cache ─────────────────────────────────────────────────────────────
+
+def _file_digest(file_path: str) -> str:
+    """SHA-256 of the file's bytes, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+_LAYOUT_CACHE_SIZE = 64
+_layout_cache: "OrderedDict[str, str]" = OrderedDict()   # digest → layout JSON
+_layout_cache_lock = threading.Lock()
+
+
+def _cached_layout(digest: str, file_path: str) -> str:
+    """Layout context as JSON, keyed by content digest alone — uploads are
+    saved under fresh paths, so the same PDF uploaded again is a hit, while
+    an edited file at the same path is re-analysed.  ``file_path`` is only
+    read on a miss.  Failures raise and are never cached."""
+    with _layout_cache_lock:
+        if digest in _layout_cache:
+            _layout_cache.move_to_end(digest)
+            return _layout_cache[digest]
+
+    layout = json.dumps(LayoutAgent()._analyze_pdf(file_path))
+    with _layout_cache_lock:
+        _layout_cache[digest] = layout
+        _layout_cache.move_to_end(digest)
+        while len(_layout_cache) > _LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
@@ -19,11 +19,16 @@ The checks are:
 """
 
 import io
+import os
 import re
 import json
 import base64
 import logging
+import multiprocessing
 import statistics
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from typing import Optional
 
@@ -60,11 +65,96 @@ def _pil_to_base64(img: Image.Image) -> str:
     return base64.b64encode(buf.getvalue()).decode()
 
 
-def _laplacian_variance(img: Image.Image) -> float:
-    """Compute Laplacian variance (sharpness measure) for a PIL Image."""
-    arr = cv2.cvtColor(np.array(img), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(arr, cv2.COLOR_BGR2GRAY)
-    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+def _laplacian_variance(gray: np.ndarray) -> float:
+    """Compute Laplacian variance (sharpness measure) for a grayscale image.
+
+    The 3×3 Laplacian of uint8 pixels lies within ±1020, so an int16 response
+    is exact at a quarter of the float64 bandwidth; meanStdDev accumulates in
+    double precision.
+    """
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+    return float(std[0, 0]) ** 2
+
+
+def _measure_page(page: fitz.Page, mat: fitz.Matrix) -> tuple[int, int, float]:
+    """Render one page and return ``(width, height, laplacian_variance)``.
+
+    OpenCV reads the RGB pixmap buffer in place — no PIL round-trip — and
+    converts it to gray in one pass.  (MuPDF's own grayscale rendering
+    weights colours differently and shifts the variance the SHARPNESS_*
+    thresholds were calibrated on.)
+    """
+    pix = page.get_pixmap(matrix=mat)
+    rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+    return pix.width, pix.height, _laplacian_variance(gray)
+
+
+def _render_measure_page(file_path: str, page_number: int, dpi: int) -> tuple[int, int, float]:
+    """Process-pool worker: measure one page.  Opens the file itself —
+    PyMuPDF documents cannot be pickled across processes."""
+    zoom = dpi / 72.0
+    doc = fitz.open(file_path)
+    try:
+        return _measure_page(doc.load_page(page_number), fitz.Matrix(zoom, zoom))
+    finally:
+        doc.close()
+
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+
+def _get_render_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by every document, started on first use.
+
+    Workers come from a forkserver, not a fork of this process: the agents run
+    in orchestrator threads alongside PyMuPDF/pdfplumber work, and a child
+    forked mid-call can inherit a held lock and deadlock.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _render_pool
+
+
+def _render_and_measure_pages(file_path: str, dpi: int) -> list[tuple[int, int, float]]:
+    """Render every page once at ``dpi`` and return ``(width, height,
+    laplacian_variance)`` per page — the inputs of checks 6 and 7.
+
+    Pages are independent and CPU-bound, so multi-page documents are spread
+    over up to ``settings.TAMPERING_WORKERS`` processes.
+    """
+    global _render_pool
+    zoom = dpi / 72.0
+    mat = fitz.Matrix(zoom, zoom)
+    workers = min(settings.TAMPERING_WORKERS, os.cpu_count() or 1)
+    doc = fitz.open(file_path)
+    try:
+        num_pages = len(doc)
+        if workers <= 1 or num_pages <= 1:
+            return [_measure_page(page, mat) for page in doc]
+    finally:
+        doc.close()
+
+    pool = _get_render_pool(workers)
+    try:
+        # chunksize=1 keeps at most one rendered page per worker in memory
+        return list(pool.map(
+            _render_measure_page,
+            [file_path] * num_pages, range(num_pages), [dpi] * num_pages,
+            chunksize=1,
+        ))
+    except BrokenProcessPool:
+        # A dead worker breaks the pool for good; start a fresh one next time
+        with _render_pool_lock:
+            if _render_pool is pool:
+                _render_pool = None
+        raise
 
 
 def _parse_pdf_date(raw: str) -> Optional[datetime]:
@@ -249,21 +339,28 @@ def check_font_consistency(file_path: str) -> dict:
 
 
 def check_page_dimensions(file_path: str) -> dict:
-    """Check 5: Verify page dimensions meet minimum thresholds."""
+    """Check 5: Verify page dimensions meet minimum thresholds.
+
+    The pixel size a page would render to at the check's DPI follows from
+    its geometry alone, so nothing is rasterised here.
+    """
     name = "Page Dimension Check"
     try:
         min_h = settings.DIMENSION_MIN_HEIGHT
         min_w = settings.DIMENSION_MIN_WIDTH
         dpi = settings.CHECK_SPECIFIC_DPI.get("document_dimension", 300)
+        zoom = dpi / 72.0
+        mat = fitz.Matrix(zoom, zoom)
 
         doc = fitz.open(file_path)
-        num_pages = len(doc)
+        # Same integer bounds get_pixmap(matrix=mat) would produce
+        sizes = [(page.rect * mat).irect for page in doc]
         doc.close()
+        num_pages = len(sizes)
         failures = []
 
-        for page_num in range(num_pages):
-            img = _pdf_page_to_pil(file_path, page_num, dpi=dpi)
-            w, h = img.width, img.height
+        for page_num, bounds in enumerate(sizes):
+            w, h = bounds.width, bounds.height
             reasons = []
             if h < min_h:
                 reasons.append(f"height {h}px < min {min_h}px")
@@ -284,23 +381,22 @@ def check_page_dimensions(file_path: str) -> dict:
         return {"check": name, "status": "warning", "details": f"Error: {e}"}
 
 
-def check_page_clarity(file_path: str) -> dict:
+def check_page_clarity(file_path: str, pages: Optional[list] = None) -> dict:
     """Check 6: Laplacian variance sharpness per page."""
     name = "Page Clarity Check"
     try:
         threshold = settings.SHARPNESS_THRESHOLD
         dpi = settings.CHECK_SPECIFIC_DPI.get("page_clarity", 300)
 
-        doc = fitz.open(file_path)
-        num_pages = len(doc)
-        doc.close()
+        if pages is None:
+            pages = _render_and_measure_pages(file_path, dpi)
+        num_pages = len(pages)
 
         variances: list[float] = []
         failures = []
 
-        for page_num in range(num_pages):
-            img = _pdf_page_to_pil(file_path, page_num, dpi=dpi)
-            lap = round(_laplacian_variance(img), 2)
+        for page_num, (_, _, lap_var) in enumerate(pages):
+            lap = round(lap_var, 2)
             variances.append(lap)
             if lap < threshold:
                 failures.append(
@@ -318,7 +414,7 @@ def check_page_clarity(file_path: str) -> dict:
         return {"check": name, "status": "warning", "details": f"Error: {e}"}
 
 
-def check_sharpness_spread(file_path: str) -> dict:
+def check_sharpness_spread(file_path: str, pages: Optional[list] = None) -> dict:
     """Check 7: Cross-page sharpness consistency."""
     name = "Sharpness Spread Check"
     try:
@@ -326,18 +422,20 @@ def check_sharpness_spread(file_path: str) -> dict:
         max_std = settings.SHARPNESS_MAX_STD_DEV
         dpi = settings.CHECK_SPECIFIC_DPI.get("sharpness_spread", 300)
 
-        doc = fitz.open(file_path)
-        num_pages = len(doc)
-        doc.close()
+        if pages is None:
+            doc = fitz.open(file_path)
+            num_pages = len(doc)
+            doc.close()
+        else:
+            num_pages = len(pages)
 
         if num_pages < 2:
             return {"check": name, "status": "pass",
                     "details": "Only 1 page — spread check not applicable."}
 
-        variances: list[float] = []
-        for page_num in range(num_pages):
-            img = _pdf_page_to_pil(file_path, page_num, dpi=dpi)
-            variances.append(round(_laplacian_variance(img), 2))
+        if pages is None:
+            pages = _render_and_measure_pages(file_path, dpi)
+        variances = [round(lap_var, 2) for _, _, lap_var in pages]
 
         max_v, min_v = max(variances), min(variances)
         std_v = round(statistics.stdev(variances), 2) if len(variances) > 1 else 0.0
@@ -472,14 +570,27 @@ class TamperingAgent(BaseAgent):
         checks.append(check_metadata_keywords(file_path))
         checks.append(check_font_consistency(file_path))
 
+        # Checks 6-7 share one rendering pass per distinct DPI
+        dpis = settings.CHECK_SPECIFIC_DPI
+        clarity_dpi = dpis.get("page_clarity", 300)
+        spread_dpi = dpis.get("sharpness_spread", 300)
+        rendered: dict[int, Optional[list]] = {}
+        for dpi in (clarity_dpi, spread_dpi):
+            if dpi not in rendered:
+                try:
+                    rendered[dpi] = _render_and_measure_pages(file_path, dpi)
+                except Exception:
+                    # Let the check itself retry and report the error
+                    rendered[dpi] = None
+
         # Check 5: Page dimensions
         logger.info("  📐 Running page dimension check...")
         checks.append(check_page_dimensions(file_path))
 
         # Checks 6-7: Sharpness / clarity (render pages)
         logger.info("  🔎 Running sharpness / clarity checks...")
-        checks.append(check_page_clarity(file_path))
-        checks.append(check_sharpness_spread(file_path))
+        checks.append(check_page_clarity(file_path, rendered[clarity_dpi]))
+        checks.append(check_sharpness_spread(file_path, rendered[spread_dpi]))
 
         # Check 8: Visual tampering via LLM (most expensive — last)
         logger.info("  👁️  Running visual tampering check (LLM)...")
@@ -666,8 +777,7 @@ class TamperingAgent(BaseAgent):
 
         for doc in docs:
             try:
-                img = _pdf_page_to_pil(doc.file_path, 0, dpi=150)
-                lap = _laplacian_variance(img)
+                _, _, lap = _render_measure_page(doc.file_path, 0, 150)
                 doc_sharpnesses[doc.original_filename] = round(lap, 2)
             except Exception:
                 doc_sharpnesses[doc.original_filename] = 0
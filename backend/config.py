@@ -39,8 +39,13 @@ class Settings:
         "visual_tampering": 150,
         "page_count_discrepancy": 100,
     }
+    # Worker processes for per-page rendering in the tampering checks
+    # (further capped by CPU count and page count; 1 renders in-process)
+    TAMPERING_WORKERS: int = int(os.getenv("TAMPERING_WORKERS", "4"))
 
     # Tampering thresholds
+    # (SHARPNESS_* are calibrated on 300 DPI renders — Laplacian variance is not
+    # scale-invariant, so lowering the sharpness DPIs needs a recalibration)
     DIMENSION_MIN_HEIGHT: int = 800
     DIMENSION_MIN_WIDTH: int = 1000
     SHARPNESS_THRESHOLD: float = 500.0
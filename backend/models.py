@@ -98,6 +98,8 @@ class RawTransaction(Base):
 
     # Transaction data
     date = Column(String)  # Transaction date as string (formats vary by bank)
+    day = Column(Integer)  # Day of month parsed from date at extraction (NULL if unparseable)
+    month = Column(String(3))  # Month abbreviation parsed from date: JAN, FEB, ...
     description = Column(Text)
     transaction_type = Column(String)  # credit / debit
     amount = Column(Float)
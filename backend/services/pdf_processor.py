@@ -2,6 +2,8 @@
 import io
 import base64
 import logging
+from typing import List, Optional
+
 import fitz  # PyMuPDF
 import pdfplumber
 from PIL import Image
@@ -23,16 +25,21 @@ def extract_text_with_pdfplumber(file_path: str) -> list[dict]:
     return pages
 
 
-def extract_text_with_pymupdf(file_path: str) -> list[dict]:
+def extract_text_with_pymupdf(file_path: str, page_indices: Optional[List[int]] = None) -> list[dict]:
     """
-    Extract text from each page using PyMuPDF.
+    Extract text from each page using PyMuPDF (much faster than pdfplumber
+    when no table geometry is needed).  ``page_indices`` (0-based) limits it
+    to those pages; out-of-range indices are skipped.
     Returns a list of {page_number, text} dicts.
     """
     pages = []
     doc = fitz.open(file_path)
-    for i, page in enumerate(doc):
-        text = page.get_text()
-        pages.append({"page_number": i + 1, "text": text})
+    if page_indices is None:
+        page_indices = range(doc.page_count)
+    for i in page_indices:
+        if 0 <= i < doc.page_count:
+            text = doc.load_page(i).get_text()
+            pages.append({"page_number": i + 1, "text": text})
     doc.close()
     return pages
 
@@ -0,0 +1,52 @@
+"""Quick tests for the stored day/month columns on raw transactions."""
+import os
+import sys
+import tempfile
+sys.path.insert(0, '.')
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "thirdeye-test.db"))
+
+from sqlalchemy import create_engine, inspect, text
+
+import database
+from agents._dates import parse_day, parse_month
+
+
+def test_parse_day_and_month_formats():
+    assert (parse_day("01-Sep-2025"), parse_month("01-Sep-2025")) == (1, "SEP")
+    assert (parse_day("15 DEC"), parse_month("15 DEC")) == (15, "DEC")
+    assert (parse_day("01/12/2025"), parse_month("01/12/2025")) == (1, None)
+    assert (parse_day(""), parse_month("")) == (None, None)
+
+
+def test_migration_adds_day_and_month_to_old_tables():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    # Pre-migration schema: raw_transactions without day/month
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE raw_transactions ("
+                          "id VARCHAR PRIMARY KEY, document_id VARCHAR NOT NULL, date VARCHAR)"))
+        conn.execute(text("INSERT INTO raw_transactions VALUES ('t1', 'd1', '01-Sep-2025')"))
+
+    original = database.engine
+    database.engine = engine
+    try:
+        database.init_db()
+        columns = {col["name"] for col in inspect(engine).get_columns("raw_transactions")}
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT day, month FROM raw_transactions WHERE id = 't1'")).one()
+    finally:
+        database.engine = original
+        engine.dispose()
+        os.remove(path)
+    assert {"day", "month"} <= columns
+    # Old rows stay NULL; the agents fall back to parsing the date string
+    assert tuple(row) == (None, None)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"{name}: ok")
+    print("\n=== All tests passed! ===")
@@ -0,0 +1,50 @@
+"""Quick tests for fraud agent checks."""
+import sys
+sys.path.insert(0, '.')
+from types import SimpleNamespace
+
+from agents.fraud import _build_views, check_duplicates, check_large_outliers
+
+
+def _row(date, amount, counterparty="ACME", transaction_type="debit"):
+    # Shape of a fraud _TXN_COLUMNS row
+    return SimpleNamespace(
+        date=date, amount=amount, transaction_type=transaction_type,
+        counterparty=counterparty, description="FAST PAYMENT",
+        balance=None, is_cash=False,
+    )
+
+
+def test_duplicates_keep_missing_amount():
+    views, _ = _build_views([_row("01-Jan-2024", None), _row("01-Jan-2024", None)])
+    result = check_duplicates(views)
+    assert len(result["flagged_items"]) == 1
+    assert result["flagged_items"][0]["amount"] is None
+
+
+def test_outliers_use_mad_for_larger_samples():
+    # The huge amounts inflate the standard deviation enough that mean + 3σ
+    # (≈ 53,300) would miss 50,000; the median/MAD rule flags all three.
+    amounts = [100.0 + i for i in range(30)] + [50_000.0, 55_000.0, 60_000.0]
+    views, _ = _build_views([_row("01-Jan-2024", a) for a in amounts])
+    result = check_large_outliers(views)
+    assert [item["amount"] for item in result["flagged_items"]] == [60_000.0, 55_000.0, 50_000.0]
+    assert all("mad_z" in item for item in result["flagged_items"])
+
+
+def test_outliers_fall_back_to_sigma_for_small_samples():
+    amounts = [10.0, 11.0, 12.0, 10.0, 11.0, 12.0, 10.0, 11.0, 12.0, 10.0, 900.0]
+    views, _ = _build_views([_row("01-Jan-2024", a) for a in amounts])
+    result = check_large_outliers(views)
+    item = result["flagged_items"][0]
+    assert item["amount"] == 900.0
+    assert f"{item['std_devs']}σ above the mean" in item["explanation"]
+    assert "3.0σ above mean" in result["details"]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"{name}: ok")
+    print("\n=== All tests passed! ===")
@@ -0,0 +1,35 @@
+"""Quick tests for insights agent behaviour (cash-flow peaks)."""
+import sys
+sys.path.insert(0, '.')
+from types import SimpleNamespace
+
+from agents.insights import InsightsAgent, _aggregate
+
+
+def _row(date, amount, transaction_type):
+    # Shape of a _TXN_COLUMNS row (NULLs already coalesced)
+    return SimpleNamespace(
+        date=date, amount=amount, transaction_type=transaction_type,
+        category="other", counterparty="", channel="Unknown",
+        balance=None, description="", day=None, month=None,
+    )
+
+
+def test_peak_day_ties_go_to_first_seen_day():
+    rows = [
+        _row("05-Jan-2025", 100.0, "credit"),
+        _row("03-Jan-2025", 100.0, "credit"),
+        _row("04-Jan-2025", 40.0, "debit"),
+        _row("02-Jan-2025", 40.0, "debit"),
+    ]
+    cash_flow = InsightsAgent()._cash_flow_analysis(_aggregate(rows), None)
+    assert cash_flow["peak_inflow_day"] == 5
+    assert cash_flow["peak_outflow_day"] == 4
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"{name}: ok")
+    print("\n=== All tests passed! ===")
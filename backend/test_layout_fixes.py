@@ -0,0 +1,86 @@
+"""Quick tests for layout agent behaviour (bank scoring, scanned PDFs, cache)."""
+import os
+import shutil
+import sys
+import tempfile
+sys.path.insert(0, '.')
+
+import fitz  # PyMuPDF
+
+import agents.layout as layout
+from agents.layout import LayoutAgent
+
+
+def _write_pdf(page_texts):
+    """Write a PDF with one page per text (empty text → blank page)."""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    doc = fitz.open()
+    for text in page_texts:
+        page = doc.new_page(width=595, height=842)
+        if text:
+            page.insert_text((50, 72), text)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_bank_detection_scores_every_signature():
+    # DBS scores first, but POSB's own signals outscore it
+    text = ("POSB EVERYDAY ACCOUNT\nPOSB SAYE\nPOST OFFICE SAVINGS BANK\n"
+            "DBS BANK LTD\nDBS/POSB").upper()
+    assert LayoutAgent()._detect_bank([text])["bank"] == "POSB"
+
+
+def test_bank_detection_unknown():
+    result = LayoutAgent()._detect_bank(["SOME RANDOM TEXT"])
+    assert result == {"bank": "Unknown", "confidence": 0.0}
+
+
+def test_image_only_pdf_is_scanned():
+    path = _write_pdf(["", ""])
+    try:
+        context = LayoutAgent()._analyze_pdf(path)
+    finally:
+        os.remove(path)
+    assert context["is_scanned"] is True
+    assert context["has_tables"] is False
+    assert context["multi_line_descriptions"] is False
+
+
+def test_text_pdf_is_not_scanned():
+    path = _write_pdf(["DBS BANK LTD  Statement of Account  01-SEP-2025 FAST PAYMENT 394.71"])
+    try:
+        context = LayoutAgent()._analyze_pdf(path)
+    finally:
+        os.remove(path)
+    assert context["is_scanned"] is False
+    assert context["bank_detected"] == "DBS"
+
+
+def test_layout_cache_is_keyed_by_content():
+    # Uploads are stored under fresh uuid paths; the same bytes must hit
+    path = _write_pdf(["OCBC BANK  Statement  01 SEP 2025"])
+    copy = path.replace(".pdf", "-copy.pdf")
+    shutil.copyfile(path, copy)
+    layout._layout_cache.clear()
+    calls = []
+    original = LayoutAgent._analyze_pdf
+    LayoutAgent._analyze_pdf = lambda self, p: calls.append(p) or original(self, p)
+    try:
+        first = LayoutAgent()._analyze_layout(path)
+        second = LayoutAgent()._analyze_layout(copy)
+    finally:
+        LayoutAgent._analyze_pdf = original
+        os.remove(path)
+        os.remove(copy)
+    assert calls == [path]
+    assert first == second and first is not second
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print(f"{name}: ok")
+    print("\n=== All tests passed! ===")
@@ -75,13 +75,14 @@ export default function InsightsPage() {
   if (typeof rawNarrative === "string") {
     narrativeText = rawNarrative;
   } else if (rawNarrative && typeof rawNarrative === "object") {
-    const sectionOrder = ["executive_summary", "spending_analysis", "income_analysis", "cash_flow_assessment", "risk_observations", "recommendations"];
+    const sectionOrder = ["executive_summary", "spending_analysis", "income_analysis", "cash_flow_assessment", "risk_observations", "risk_rationale", "recommendations"];
     const labelMap: Record<string, string> = {
       executive_summary: "Executive Summary",
       spending_analysis: "Spending Analysis",
       income_analysis: "Income Analysis",
       cash_flow_assessment: "Cash Flow Assessment",
       risk_observations: "Risk Observations",
+      risk_rationale: "Risk Rationale",
       recommendations: "Recommendations",
     };
     for (const key of sectionOrder) {
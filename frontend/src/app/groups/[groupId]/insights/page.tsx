@@ -115,7 +115,7 @@ export default function GroupInsightsPage() {
   } else if (rawNarrative && typeof rawNarrative === "object") {
     const sectionOrder = [
       "executive_summary", "spending_analysis", "income_analysis",
-      "cash_flow_assessment", "risk_observations", "recommendations",
+      "cash_flow_assessment", "risk_observations", "risk_rationale", "recommendations",
     ];
     const labelMap: Record<string, string> = {
       executive_summary: "Executive Summary",
@@ -123,6 +123,7 @@ export default function GroupInsightsPage() {
       income_analysis: "Income Analysis",
       cash_flow_assessment: "Cash Flow Assessment",
       risk_observations: "Risk Observations",
+      risk_rationale: "Risk Rationale",
       recommendations: "Recommendations",
     };
     for (const key of sectionOrder) {
@@ -268,6 +268,7 @@ export interface InsightsResults {
     income_analysis?: string;
     cash_flow_assessment?: string;
     risk_observations?: string;
+    risk_rationale?: string;
     recommendations?: string[] | string;
   };
 }